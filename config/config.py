@@ -1,64 +1,111 @@
 import os
+import functools
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Providers that need an API key, in auto-detect priority order
+_PROVIDER_KEYS = (
+    ("groq", "GROQ_API_KEY"),
+    ("gemini", "GEMINI_API_KEY"),
+    ("huggingface", "HUGGINGFACE_API_KEY"),
+    ("cohere", "COHERE_API_KEY"),
+    ("anthropic", "ANTHROPIC_API_KEY"),
+    ("openai", "OPENAI_API_KEY"),
+)
+_PROVIDER_KEY_ATTRS = dict(_PROVIDER_KEYS)
+
+_BASE_DIR = Path(__file__).parent.parent
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration manager for Yui"""
+    """Configuration manager for Yui (read once from the environment, see CONFIG)"""
     
     # ============ API KEYS (Choose ONE) ============
     # FREE APIS - No payment required!
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY")  # RECOMMENDED - Fast & Free
-    HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")  # Free
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")  # Free tier
-    COHERE_API_KEY = os.getenv("COHERE_API_KEY")  # Free trial
+    GROQ_API_KEY: Optional[str]  # RECOMMENDED - Fast & Free
+    HUGGINGFACE_API_KEY: Optional[str]  # Free
+    GEMINI_API_KEY: Optional[str]  # Free tier
+    COHERE_API_KEY: Optional[str]  # Free trial
     
     # PAID APIS (Optional - better quality)
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")  # Claude
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # GPT
+    ANTHROPIC_API_KEY: Optional[str]  # Claude
+    OPENAI_API_KEY: Optional[str]  # GPT
     
     # ============ MODEL SETTINGS ============
     # Choose your provider: "groq", "huggingface", "gemini", "ollama", "cohere"
-    DEFAULT_PROVIDER = os.getenv("DEFAULT_PROVIDER", "groq")
+    DEFAULT_PROVIDER: str
     
     # Model names (optional - defaults are set in LLMEngine)
-    DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "")
+    DEFAULT_MODEL: str
     
     # Generation settings
-    MAX_TOKENS = int(os.getenv("MAX_TOKENS", "2048"))
-    TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
+    MAX_TOKENS: int
+    TEMPERATURE: float
     
     # ============ BOT SETTINGS ============
-    BOT_NAME = os.getenv("BOT_NAME", "Yui")
-    DEFAULT_PERSONALITY = os.getenv("DEFAULT_PERSONALITY", "yui")
+    BOT_NAME: str
+    DEFAULT_PERSONALITY: str
+    
+    # ============ EMOTIONS ============
+    # Score sentiment with a quantized DistilBERT ONNX model instead of VADER
+    USE_ONNX_EMOTION: bool
+    ONNX_EMOTION_MODEL: Path
     
     # ============ PATHS ============
-    BASE_DIR = Path(__file__).parent.parent
-    DATA_DIR = BASE_DIR / "data"
-    LOG_DIR = BASE_DIR / "logs"
-    DATABASE_PATH = DATA_DIR / "yui_memory.db"
+    BASE_DIR: Path
+    DATA_DIR: Path
+    LOG_DIR: Path
+    DATABASE_PATH: Path
     
     # ============ LOGGING ============
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-    LOG_FILE = LOG_DIR / "yui.log"
+    LOG_LEVEL: str
+    LOG_FILE: Path
     
     @classmethod
-    def validate(cls):
+    def from_env(cls) -> "Config":
+        """Build the configuration from environment variables (and .env)"""
+        data_dir = _BASE_DIR / "data"
+        log_dir = _BASE_DIR / "logs"
+        return cls(
+            GROQ_API_KEY=os.getenv("GROQ_API_KEY"),
+            HUGGINGFACE_API_KEY=os.getenv("HUGGINGFACE_API_KEY"),
+            GEMINI_API_KEY=os.getenv("GEMINI_API_KEY"),
+            COHERE_API_KEY=os.getenv("COHERE_API_KEY"),
+            ANTHROPIC_API_KEY=os.getenv("ANTHROPIC_API_KEY"),
+            OPENAI_API_KEY=os.getenv("OPENAI_API_KEY"),
+            DEFAULT_PROVIDER=os.getenv("DEFAULT_PROVIDER", "groq"),
+            DEFAULT_MODEL=os.getenv("DEFAULT_MODEL", ""),
+            MAX_TOKENS=int(os.getenv("MAX_TOKENS", "2048")),
+            TEMPERATURE=float(os.getenv("TEMPERATURE", "0.7")),
+            BOT_NAME=os.getenv("BOT_NAME", "Yui"),
+            DEFAULT_PERSONALITY=os.getenv("DEFAULT_PERSONALITY", "yui"),
+            USE_ONNX_EMOTION=os.getenv("USE_ONNX_EMOTION", "false").lower() in ("1", "true", "yes"),
+            ONNX_EMOTION_MODEL=Path(os.getenv("ONNX_EMOTION_MODEL", str(data_dir / "distilbert-sst2-int8.onnx"))),
+            BASE_DIR=_BASE_DIR,
+            DATA_DIR=data_dir,
+            LOG_DIR=log_dir,
+            DATABASE_PATH=data_dir / "yui_memory.db",
+            LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO"),
+            LOG_FILE=log_dir / "yui.log",
+        )
+    
+    def init(self):
+        """Validate configuration once at startup (call from the app entrypoint)"""
+        return _init_once(self)
+    
+    def has_api_key(self) -> bool:
+        """Check if at least one API key is available (or using Ollama)"""
+        return _has_api_key(self)
+    
+    def validate(self):
         """Validate configuration"""
-        # Check if at least one API key is available (or using Ollama)
-        has_api_key = any([
-            cls.GROQ_API_KEY,
-            cls.HUGGINGFACE_API_KEY,
-            cls.GEMINI_API_KEY,
-            cls.COHERE_API_KEY,
-            cls.ANTHROPIC_API_KEY,
-            cls.OPENAI_API_KEY,
-            cls.DEFAULT_PROVIDER == "ollama"  # Ollama doesn't need API key
-        ])
-        
-        if not has_api_key:
+        if not self.has_api_key():
             raise ValueError("""
 ╔════════════════════════════════════════════════════════════╗
 ║  NO API KEY FOUND!                                         ║
@@ -86,45 +133,53 @@ class Config:
 """)
         
         # Create directories if they don't exist
-        cls.DATA_DIR.mkdir(exist_ok=True)
-        cls.LOG_DIR.mkdir(exist_ok=True)
+        self.DATA_DIR.mkdir(exist_ok=True)
+        self.LOG_DIR.mkdir(exist_ok=True)
         
         return True
     
-    @classmethod
-    def get_active_provider(cls):
-        """Get which provider is being used"""
-        # Respect DEFAULT_PROVIDER setting first
-        if cls.DEFAULT_PROVIDER:
-            provider = cls.DEFAULT_PROVIDER.lower()
-            
-            # Validate provider has required key
-            if provider == "ollama":
-                return "ollama"
-            elif provider == "groq" and cls.GROQ_API_KEY:
-                return "groq"
-            elif provider == "gemini" and cls.GEMINI_API_KEY:
-                return "gemini"
-            elif provider == "huggingface" and cls.HUGGINGFACE_API_KEY:
-                return "huggingface"
-            elif provider == "cohere" and cls.COHERE_API_KEY:
-                return "cohere"
-        
-        # Fallback: auto-detect first available API
-        if cls.GROQ_API_KEY:
-            return "groq"
-        elif cls.GEMINI_API_KEY:
-            return "gemini"
-        elif cls.HUGGINGFACE_API_KEY:
-            return "huggingface"
-        elif cls.COHERE_API_KEY:
-            return "cohere"
-        elif cls.ANTHROPIC_API_KEY:
-            return "anthropic"
-        elif cls.OPENAI_API_KEY:
-            return "openai"
-        
-        return None
+    def get_active_provider(self):
+        """Get which provider is being used (resolved once, then cached)"""
+        return _resolve_provider(self)
+    
+    def invalidate_provider_cache(self):
+        """Forget cached provider/key checks (e.g. after changing keys in tests)"""
+        _resolve_provider.cache_clear()
+        _has_api_key.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def _init_once(config: Config) -> bool:
+    return config.validate()
+
+
+@functools.lru_cache(maxsize=None)
+def _has_api_key(config: Config) -> bool:
+    return (
+        any(getattr(config, key_attr) for _, key_attr in _PROVIDER_KEYS)
+        or config.DEFAULT_PROVIDER == "ollama"  # Ollama doesn't need API key
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_provider(config: Config) -> Optional[str]:
+    """Work out the provider from DEFAULT_PROVIDER and available keys"""
+    # Respect DEFAULT_PROVIDER setting first (if its key is set)
+    if config.DEFAULT_PROVIDER:
+        provider = config.DEFAULT_PROVIDER.lower()
+        if provider == "ollama":
+            return "ollama"  # Local, no key needed
+        key_attr = _PROVIDER_KEY_ATTRS.get(provider)
+        if key_attr and getattr(config, key_attr):
+            return provider
+    
+    # Fallback: auto-detect first available API
+    for provider, key_attr in _PROVIDER_KEYS:
+        if getattr(config, key_attr):
+            return provider
+    
+    return None
+
 
-# Validate on import
-Config.validate()
\ No newline at end of file
+# Process-wide configuration
+CONFIG = Config.from_env()
@@ -1,23 +1,32 @@
-from typing import List, Dict, Optional
+import time
+import atexit
+import logging
+import weakref
+from collections import deque
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from core.llm import LLMEngine
 from personalities.base_personality import get_personality
-from config.config import Config
+from config.config import CONFIG
 
-# Import memory and emotion systems
-try:
-    from memory.memory_manager import MemoryManager
-    MEMORY_AVAILABLE = True
-except ImportError:
-    MEMORY_AVAILABLE = False
-    print("⚠️  Memory system not available")
+logger = logging.getLogger("yui.conversation")
+logger.setLevel(CONFIG.LOG_LEVEL.upper())
 
-try:
-    from emotions.emotion_detector import EmotionDetector, EmotionState
-    EMOTIONS_AVAILABLE = True
-except ImportError:
-    EMOTIONS_AVAILABLE = False
-    print("⚠️  Emotion detection not available")
+# Buffered memory writes are flushed once this many are pending...
+_WRITE_BATCH_SIZE = 8
+# ...or once the oldest pending write is this old (seconds)
+_WRITE_BATCH_WINDOW = 0.25
+# Number of past conversations pulled into the system prompt
+_MEMORY_CONTEXT_ITEMS = 2
+
+# Open conversations, closed at interpreter exit so buffered writes land
+_open_conversations = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_conversations():
+    for conversation in list(_open_conversations):
+        conversation.close()
 
 
 class ConversationManager:
@@ -25,131 +34,269 @@ class ConversationManager:
     
     def __init__(self, personality_name: str = "yui", user_name: str = "User"):
         # Initialize LLM with configured provider
-        provider = Config.get_active_provider()
+        provider = CONFIG.get_active_provider()
         self.llm = LLMEngine(provider=provider)
         self.personality = get_personality(personality_name)
         self.user_name = user_name
-        self.conversation_history: List[Dict] = []
         self.max_history = 20  # Keep last 20 messages for context
+        # History is stored as parallel columns; the LLM path only needs
+        # roles and contents. Oldest entries fall off once max_history is reached
+        self._roles = deque(maxlen=self.max_history)
+        self._contents = deque(maxlen=self.max_history)
+        self._timestamps = deque(maxlen=self.max_history)
+        self._emotions = deque(maxlen=self.max_history)
+        
+        # Personality prompt, reused until the personality or the minute changes
+        # (Yui's prompt embeds the current date and time at minute resolution)
+        self._base_system_prompt: Optional[str] = None
+        self._base_prompt_minute = None
+        
+        # LLM-formatted view of the history, rebuilt only after it changes
+        self._llm_view: Optional[List[Dict]] = None
+        self._llm_view_dirty = True
+        
+        # Memory and emotion systems are heavy (SQLite, vector store, VADER),
+        # so they are loaded on first use through the properties below
+        self._memory = None
+        self._memory_loaded = False
+        self._emotion_detector = None
+        self._emotion_state = None
+        self._emotions_loaded = False
+        
+        # Messages waiting to be written to memory in one batch
+        self._pending_writes: List[Tuple] = []
+        self._pending_since = 0.0
+        
+        # Most recent emotion analysis, so a message is never analyzed twice in a row
+        self._last_emotion_key: Optional[int] = None
+        self._last_emotion_text: Optional[str] = None
+        self._last_emotion_data: Optional[Dict] = None
+        
+        # Prompt fragments for the handful of distinct emotion states
+        self._emotion_context_cache: Dict[Tuple[str, str], str] = {}
+        self._tone_cache: Dict[str, str] = {}
         
-        # Initialize memory system
-        if MEMORY_AVAILABLE:
+        self._closed = False
+        _open_conversations.add(self)
+    
+    @property
+    def memory(self):
+        """Memory manager, created on first access (None if unavailable)"""
+        if not self._memory_loaded:
+            self._memory_loaded = True
             try:
-                self.memory = MemoryManager(user_name)
-                self.memory.start_session(self.personality.name)
-                print(f"✅ Memory system enabled for {user_name}")
+                from memory.memory_manager import MemoryManager
+            except ImportError:
+                logger.warning("Memory system not available")
+                return None
+            try:
+                self._memory = MemoryManager(self.user_name)
+                self._memory.start_session(self.personality.name)
+                print(f"✅ Memory system enabled for {self.user_name}")
             except Exception as e:
-                print(f"⚠️  Memory system failed to initialize: {e}")
-                self.memory = None
-        else:
-            self.memory = None
-        
-        # Initialize emotion detection
-        if EMOTIONS_AVAILABLE:
+                logger.warning(f"Memory system failed to initialize: {e}")
+                self._memory = None
+        return self._memory
+    
+    def _load_emotions(self):
+        """Create emotion detector and state on first access"""
+        self._emotions_loaded = True
+        try:
+            from emotions.emotion_detector import EmotionDetector, EmotionState
+        except ImportError:
+            logger.warning("Emotion detection not available")
+            return
+        try:
+            self._emotion_detector = self._create_emotion_detector(EmotionDetector)
+            self._emotion_state = EmotionState()
+            print(f"✅ Emotion detection enabled")
+        except Exception as e:
+            logger.warning(f"Emotion detection failed to initialize: {e}")
+            self._emotion_detector = None
+            self._emotion_state = None
+    
+    def _create_emotion_detector(self, default_cls):
+        """ONNX detector when enabled in config, otherwise the VADER one"""
+        if CONFIG.USE_ONNX_EMOTION:
             try:
-                self.emotion_detector = EmotionDetector()
-                self.emotion_state = EmotionState()
-                print(f"✅ Emotion detection enabled")
+                from emotions.onnx_detector import ONNXEmotionDetector
+                return ONNXEmotionDetector(CONFIG.ONNX_EMOTION_MODEL)
             except Exception as e:
-                print(f"⚠️  Emotion detection failed to initialize: {e}")
-                self.emotion_detector = None
-                self.emotion_state = None
-        else:
-            self.emotion_detector = None
-            self.emotion_state = None
+                logger.warning(f"ONNX emotion model unavailable, using VADER: {e}")
+        return default_cls()
+    
+    @property
+    def emotion_detector(self):
+        """Emotion detector, created on first access (None if unavailable)"""
+        if not self._emotions_loaded:
+            self._load_emotions()
+        return self._emotion_detector
+    
+    @property
+    def emotion_state(self):
+        """Bot emotion state, created on first access (None if unavailable)"""
+        if not self._emotions_loaded:
+            self._load_emotions()
+        return self._emotion_state
         
     def add_message(self, role: str, content: str, emotion: Optional[str] = None):
         """Add message to conversation history"""
-        self.conversation_history.append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "emotion": emotion
-        })
+        self._roles.append(role)
+        self._contents.append(content)
+        # Raw epoch seconds; formatted to ISO only when someone reads it
+        now = time.time()
+        self._timestamps.append(now)
+        self._emotions.append(emotion)
+        self._llm_view_dirty = True
         
-        # Save to persistent memory
+        # Queue for persistent memory; written in batches
         if self.memory:
-            try:
-                self.memory.save_message(
-                    role=role,
-                    content=content,
-                    personality=self.personality.name,
-                    emotion=emotion
-                )
-            except Exception as e:
-                print(f"⚠️  Failed to save to memory: {e}")
-        
-        # Trim history if too long (keep most recent messages)
-        if len(self.conversation_history) > self.max_history:
-            self.conversation_history = self.conversation_history[-self.max_history:]
+            if not self._pending_writes:
+                self._pending_since = now
+            self._pending_writes.append((role, content, self.personality.name, emotion, now))
+            if (len(self._pending_writes) >= _WRITE_BATCH_SIZE
+                    or now - self._pending_since >= _WRITE_BATCH_WINDOW):
+                self.flush_memory()
     
-    def get_messages_for_llm(self) -> List[Dict]:
-        """Format conversation history for LLM (without timestamps)"""
+    def flush_memory(self):
+        """Write any buffered messages to persistent memory in one batch"""
+        if not self._pending_writes or not self._memory:
+            return
+        rows, self._pending_writes = self._pending_writes, []
+        try:
+            self._memory.save_messages(rows)
+        except Exception as e:
+            logger.warning(f"Failed to save to memory: {e}")
+    
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Conversation history as a list of message dicts"""
         return [
-            {"role": msg["role"], "content": msg["content"]}
-            for msg in self.conversation_history
+            {"role": r, "content": c, "timestamp": datetime.fromtimestamp(t).isoformat(), "emotion": e}
+            for r, c, t, e in zip(self._roles, self._contents, self._timestamps, self._emotions)
         ]
     
-    def send_message(self, user_message: str) -> str:
+    def get_messages_for_llm(self) -> List[Dict]:
         """
-        Send user message and get bot response
+        Format conversation history for LLM (without timestamps)
+        
+        The returned list is cached until the history changes, so callers
+        must not modify it.
+        """
+        if self._llm_view_dirty:
+            self._llm_view = [
+                {"role": r, "content": c}
+                for r, c in zip(self._roles, self._contents)
+            ]
+            self._llm_view_dirty = False
+        return self._llm_view
+    
+    def _get_base_system_prompt(self) -> str:
+        """Personality system prompt for this user, cached per minute"""
+        minute = int(time.time() // 60)
+        if self._base_system_prompt is None or minute != self._base_prompt_minute:
+            self._base_system_prompt = self.personality.get_system_prompt(self.user_name)
+            self._base_prompt_minute = minute
+        return self._base_system_prompt
+    
+    def _analyze_emotion_once(self, emo, user_message: str) -> Dict:
+        """Analyze a message's emotion, reusing the result if it was just analyzed"""
+        key = hash(user_message)
+        if key == self._last_emotion_key and user_message == self._last_emotion_text:
+            return self._last_emotion_data
+        emotion_data = emo.analyze_emotion(user_message)
+        self._last_emotion_key = key
+        self._last_emotion_text = user_message
+        self._last_emotion_data = emotion_data
+        return emotion_data
+    
+    def _cached_emotion_context(self, emo, emotion_data: Dict) -> str:
+        """Emotion context string, cached by (emotion, intensity)"""
+        emotion_key = (emotion_data['emotion'], emotion_data['intensity'])
+        context = self._emotion_context_cache.get(emotion_key)
+        if context is None:
+            context = emo.get_emotion_context(emotion_data)
+            self._emotion_context_cache[emotion_key] = context
+        return context
+    
+    def _cached_tone_instruction(self, estate) -> str:
+        """Tone instruction for the bot's current mood, cached by mood"""
+        mood = estate.current_mood
+        tone = self._tone_cache.get(mood)
+        if tone is None:
+            tone = estate.get_tone_instruction()
+            self._tone_cache[mood] = tone
+        return tone
+    
+    def _prepare_turn(self, user_message: str) -> Tuple[List[Dict], str]:
+        """
+        Record the user's message and build everything the LLM needs for a reply
+        
+        Detects emotion, updates the bot's mood, adds the message to history and
+        assembles the system prompt with emotion, tone and memory context.
         
         Args:
             user_message: The user's message
             
         Returns:
-            Bot's response
+            (messages for the LLM, system prompt)
         """
-        # Detect emotion from user message
-        emotion_data = None
-        if self.emotion_detector:
+        # Bind subsystems once for the whole turn
+        memory = self.memory
+        emo = self.emotion_detector
+        estate = self.emotion_state
+        
+        # Detect emotion, update the bot's mood and build the emotion/tone prompt
+        detected_emotion = None
+        emotion_prompt = ""
+        if emo:
             try:
-                emotion_data = self.emotion_detector.analyze_emotion(user_message)
+                emotion_data = self._analyze_emotion_once(emo, user_message)
                 detected_emotion = emotion_data['emotion']
-                
-                # Update bot's emotional state
-                if self.emotion_state:
-                    self.emotion_state.update_mood(detected_emotion)
+                emotion_prompt = f"\n\n{self._cached_emotion_context(emo, emotion_data)}"
+                if estate:
+                    estate.update_mood(detected_emotion)
+                    emotion_prompt += f"\n{self._cached_tone_instruction(estate)}"
             except Exception as e:
-                print(f"⚠️  Emotion detection error: {e}")
+                logger.warning(f"Emotion detection error: {e}")
                 detected_emotion = None
-        else:
-            detected_emotion = None
+                emotion_prompt = ""
         
         # Add user message to history
         self.add_message("user", user_message, detected_emotion)
         
         # Build system prompt with personality and context
-        system_prompt = self.personality.get_system_prompt(self.user_name)
-        
-        # Add emotion context if available
-        if emotion_data and self.emotion_detector:
-            emotion_context = self.emotion_detector.get_emotion_context(emotion_data)
-            system_prompt += f"\n\n{emotion_context}"
-        
-        # Add emotional tone instruction
-        if self.emotion_state:
-            tone_instruction = self.emotion_state.get_tone_instruction()
-            system_prompt += f"\n{tone_instruction}"
+        system_prompt = self._get_base_system_prompt() + emotion_prompt
         
         # Get relevant memories if available
-        if self.memory:
+        if memory:
             try:
-                relevant_memories = self.memory.get_relevant_context(user_message, max_items=2)
+                relevant_memories = memory.get_relevant_context(user_message, max_items=_MEMORY_CONTEXT_ITEMS)
                 if relevant_memories:
-                    memory_context = "\n\nRelevant past conversations:\n" + "\n".join(relevant_memories)
-                    system_prompt += memory_context
+                    system_prompt = f"{system_prompt}\n\nRelevant past conversations:\n" + "\n".join(relevant_memories)
             except Exception as e:
-                print(f"⚠️  Memory retrieval error: {e}")
+                logger.warning(f"Memory retrieval error: {e}")
+        
+        return self.get_messages_for_llm(), system_prompt
+    
+    def send_message(self, user_message: str) -> str:
+        """
+        Send user message and get bot response
         
-        # Get messages for LLM
-        messages = self.get_messages_for_llm()
+        Args:
+            user_message: The user's message
+            
+        Returns:
+            Bot's response
+        """
+        messages, system_prompt = self._prepare_turn(user_message)
         
         # Generate response
         bot_response = self.llm.generate(messages, system_prompt)
         
         # Add bot response to history
         self.add_message("assistant", bot_response)
+        self.flush_memory()
         
         return bot_response
     
@@ -163,71 +310,52 @@ class ConversationManager:
         Yields:
             Response chunks
         """
-        # Detect emotion
-        emotion_data = None
-        if self.emotion_detector:
-            try:
-                emotion_data = self.emotion_detector.analyze_emotion(user_message)
-                detected_emotion = emotion_data['emotion']
-                if self.emotion_state:
-                    self.emotion_state.update_mood(detected_emotion)
-            except:
-                detected_emotion = None
-        else:
-            detected_emotion = None
-        
-        # Add user message to history
-        self.add_message("user", user_message, detected_emotion)
-        
-        # Build system prompt
-        system_prompt = self.personality.get_system_prompt(self.user_name)
-        
-        if emotion_data and self.emotion_detector:
-            emotion_context = self.emotion_detector.get_emotion_context(emotion_data)
-            system_prompt += f"\n\n{emotion_context}"
-        
-        if self.emotion_state:
-            tone_instruction = self.emotion_state.get_tone_instruction()
-            system_prompt += f"\n{tone_instruction}"
-        
-        # Get messages for LLM
-        messages = self.get_messages_for_llm()
+        messages, system_prompt = self._prepare_turn(user_message)
         
         # Stream response
-        full_response = ""
+        chunks: List[str] = []
         for chunk in self.llm.stream_generate(messages, system_prompt):
-            full_response += chunk
+            chunks.append(chunk)
             yield chunk
         
         # Add complete response to history
-        self.add_message("assistant", full_response)
+        self.add_message("assistant", "".join(chunks))
+        self.flush_memory()
     
     def switch_personality(self, personality_name: str):
         """Switch to a different personality"""
+        # Pending messages belong to the current session
+        self.flush_memory()
         self.personality = get_personality(personality_name)
+        self._base_system_prompt = None
         
-        # Update memory session
-        if self.memory:
+        # Update memory session (if not loaded yet it will start with the new personality)
+        if self._memory:
             try:
                 self.memory.end_session()
-                self.memory.session_id = None
+                self.memory.clear_session_memory()
                 self.memory.start_session(self.personality.name)
             except Exception as e:
-                print(f"⚠️  Memory session update error: {e}")
+                logger.warning(f"Memory session update error: {e}")
         
         print(f"\n✨ Switched to {self.personality.name} personality\n")
     
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.flush_memory()
+        self._roles.clear()
+        self._contents.clear()
+        self._timestamps.clear()
+        self._emotions.clear()
+        self._llm_view_dirty = True
         
         # Clear memory session (start new one)
-        if self.memory:
+        if self._memory:
             try:
                 self.memory.clear_session_memory()
                 self.memory.start_session(self.personality.name)
             except Exception as e:
-                print(f"⚠️  Memory clear error: {e}")
+                logger.warning(f"Memory clear error: {e}")
         
         print("\n🗑️  Conversation history cleared\n")
     
@@ -235,9 +363,9 @@ class ConversationManager:
         """Get a summary of the conversation"""
         base_summary = f"""
 Conversation with {self.personality.name}
-Total messages: {len(self.conversation_history)}
+Total messages: {len(self._roles)}
 User: {self.user_name}
-Started: {self.conversation_history[0]['timestamp'] if self.conversation_history else 'N/A'}
+Started: {datetime.fromtimestamp(self._timestamps[0]).isoformat() if self._timestamps else 'N/A'}
 """
         
         # Add memory stats if available
@@ -251,14 +379,34 @@ Memory Stats:
 - Favorite personality: {stats['favorite_personality']}
 """
             except Exception as e:
-                print(f"⚠️  Stats retrieval error: {e}")
+                logger.warning(f"Stats retrieval error: {e}")
         
         return base_summary
     
+    def close(self):
+        """Flush buffered memory writes and end the memory session (safe to call twice)"""
+        if self._closed:
+            return
+        self._closed = True
+        _open_conversations.discard(self)
+        if self._memory:
+            try:
+                self.flush_memory()
+                self._memory.close()
+            except Exception as e:
+                logger.warning(f"Memory close error: {e}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
     def __del__(self):
         """Cleanup on deletion"""
-        if hasattr(self, 'memory') and self.memory:
-            try:
-                self.memory.end_session()
-            except:
-                pass
\ No newline at end of file
+        try:
+            if not getattr(self, '_closed', True):
+                self.close()
+        except:
+            pass
\ No newline at end of file
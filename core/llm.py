@@ -1,6 +1,230 @@
+import asyncio
 import requests
-from typing import List, Dict, Optional
-from config.config import Config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Optional, Tuple
+from config.config import CONFIG
+from core.llm_cache import LLMCache, is_cacheable
+
+try:
+    import orjson as _json  # C parser, accepts bytes directly
+    _dumps = _json.dumps
+except ImportError:
+    import json as _json
+    
+    def _dumps(obj) -> bytes:
+        return _json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+
+# ============ PAYLOAD BUILDERS / RESPONSE PARSERS ============
+# Pure functions shared by the sync and async request paths
+
+def _with_system(messages: List[Dict], system_prompt: str):
+    """Messages with the system prompt in front, without copying when there is none"""
+    # A tuple serializes as a JSON array; the caller's list is never mutated
+    if system_prompt:
+        return ({"role": "system", "content": system_prompt}, *messages)
+    return messages
+
+
+def _build_groq_payload(model: str, messages: List[Dict], system_prompt: str, temperature: float) -> Dict:
+    """OpenAI-compatible chat payload (Groq)"""
+    return {
+        "model": model,
+        "messages": _with_system(messages, system_prompt),
+        "temperature": temperature,
+        "max_tokens": 2048
+    }
+
+
+def _build_huggingface_payload(model: str, messages: List[Dict], system_prompt: str, temperature: float) -> Dict:
+    """Single-prompt payload in Mistral instruct format (HuggingFace)"""
+    # Format as single prompt (collect parts and join once)
+    parts = []
+    if system_prompt:
+        parts.append(f"<s>[INST] {system_prompt}\n\n")
+    
+    for msg in messages:
+        if msg["role"] == "user":
+            parts.append(f"{msg['content']} [/INST]")
+        elif msg["role"] == "assistant":
+            parts.append(f" {msg['content']} </s><s>[INST] ")
+    
+    return {
+        "inputs": "".join(parts),
+        "parameters": {
+            "max_new_tokens": 1024,
+            "temperature": temperature,
+            "return_full_text": False
+        }
+    }
+
+
+def _build_gemini_payload(model: str, messages: List[Dict], system_prompt: str, temperature: float) -> Dict:
+    """generateContent payload (Gemini)"""
+    # Format messages for Gemini
+    contents = []
+    
+    # Add system prompt as first user message
+    if system_prompt:
+        contents.append({
+            "role": "user",
+            "parts": [{"text": system_prompt}]
+        })
+        contents.append({
+            "role": "model",
+            "parts": [{"text": "Understood. I'll follow these guidelines."}]
+        })
+    
+    for msg in messages:
+        role = "user" if msg["role"] == "user" else "model"
+        contents.append({
+            "role": role,
+            "parts": [{"text": msg["content"]}]
+        })
+    
+    return {
+        "contents": contents,
+        "generationConfig": {
+            "temperature": temperature,
+            "maxOutputTokens": 2048
+        }
+    }
+
+
+def _build_ollama_payload(model: str, messages: List[Dict], system_prompt: str, temperature: float) -> Dict:
+    """Non-streaming chat payload (Ollama)"""
+    return {
+        "model": model,
+        "messages": _with_system(messages, system_prompt),
+        "stream": False,
+        "options": {
+            "temperature": temperature
+        }
+    }
+
+
+def _build_cohere_payload(model: str, messages: List[Dict], system_prompt: str, temperature: float) -> Dict:
+    """Chat payload with separate history and preamble (Cohere)"""
+    # Get last user message
+    user_message = messages[-1]["content"] if messages else ""
+    
+    # Format chat history
+    chat_history = []
+    for msg in messages[:-1]:
+        chat_history.append({
+            "role": "USER" if msg["role"] == "user" else "CHATBOT",
+            "message": msg["content"]
+        })
+    
+    return {
+        "model": model,
+        "message": user_message,
+        "chat_history": chat_history,
+        "preamble": system_prompt,
+        "temperature": temperature
+    }
+
+
+def _parse_groq_response(data: Dict) -> str:
+    return data["choices"][0]["message"]["content"]
+
+
+def _parse_huggingface_response(data) -> str:
+    if isinstance(data, list):
+        return data[0]["generated_text"]
+    return data["generated_text"]
+
+
+def _parse_gemini_response(data: Dict) -> str:
+    return data["candidates"][0]["content"]["parts"][0]["text"]
+
+
+def _parse_ollama_response(data: Dict) -> str:
+    return data["message"]["content"]
+
+
+def _parse_cohere_response(data: Dict) -> str:
+    return data["text"]
+
+
+def _gemini_url(model: str) -> str:
+    # Gemini 1.5 / 2.x models require v1beta
+    version = "v1beta" if "1.5" in model or "2." in model else "v1"
+    return f"https://generativelanguage.googleapis.com/{version}/models/{model}:generateContent"
+
+
+def _error_message(data: Dict) -> str:
+    """{"error": {"message": ...}} (Groq, Gemini)"""
+    return data.get('error', {}).get('message', 'Unknown error')
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """Everything that differs between providers for a non-streaming call"""
+    name: str
+    url: Callable[[str, str], str]  # (base_url, model) -> request URL
+    payload: Callable[[str, List[Dict], str, float], Dict]
+    parse: Callable[[Dict], str]
+    error: Callable[[Dict], str]  # error JSON body -> message
+    auth: str = "bearer"  # "bearer" header, "query" key param, or "none"
+    timeout: Tuple[float, float] = (5, 30)  # (connect, read) seconds
+    error_label: str = "API Error"
+    connect_error: Optional[str] = None
+    timeout_error: str = "Error: Request timed out. Check your internet connection."
+
+
+_PROVIDER_TABLE = {
+    "groq": ProviderSpec(
+        name="Groq",
+        url=lambda base_url, model: base_url,
+        payload=_build_groq_payload,
+        parse=_parse_groq_response,
+        error=_error_message,
+    ),
+    "huggingface": ProviderSpec(
+        name="HuggingFace",
+        url=lambda base_url, model: f"{base_url}/{model}",
+        payload=_build_huggingface_payload,
+        parse=_parse_huggingface_response,
+        error=lambda data: data.get('error', 'Unknown error'),
+    ),
+    "gemini": ProviderSpec(
+        name="Gemini",
+        url=lambda base_url, model: _gemini_url(model),
+        payload=_build_gemini_payload,
+        parse=_parse_gemini_response,
+        error=_error_message,
+        auth="query",
+    ),
+    "ollama": ProviderSpec(
+        name="Ollama",
+        url=lambda base_url, model: base_url,
+        payload=_build_ollama_payload,
+        parse=_parse_ollama_response,
+        error=lambda data: "Is Ollama running? Start it with: ollama serve",
+        auth="none",
+        timeout=(5, 60),
+        error_label="Error",
+        connect_error="Error: Cannot connect to Ollama. Make sure Ollama is running (ollama serve)",
+        timeout_error="Error: Request timed out. Ollama might be processing a large model.",
+    ),
+    "cohere": ProviderSpec(
+        name="Cohere",
+        url=lambda base_url, model: base_url,
+        payload=_build_cohere_payload,
+        parse=_parse_cohere_response,
+        error=lambda data: data.get('message', 'Unknown error'),
+    ),
+}
+
 
 class LLMEngine:
     """
@@ -20,9 +244,40 @@ class LLMEngine:
         self.model = model or self._get_default_model()
         self.api_key = self._get_api_key()
         self.base_url = self._get_base_url()
+        self._spec = _PROVIDER_TABLE.get(self.provider)
+        self.session = self._create_session()
+        self._url = self._spec.url(self.base_url, self.model) if self._spec else self.base_url
+        # Query-param keys (Gemini) are passed per request so they stay out of the URL string
+        self._params = {"key": self.api_key} if self._spec and self._spec.auth == "query" else None
+        self._aclient = None  # httpx.AsyncClient, created on first async call
+        self.cache = LLMCache()
         
         print(f"✓ Using {self.provider} with model: {self.model}")
     
+    def _create_session(self) -> requests.Session:
+        """Create a pooled keep-alive session so calls reuse TCP/TLS connections"""
+        session = requests.Session()
+        # Transient rate limits / server errors are retried with exponential backoff
+        # (honoring Retry-After); once retries run out the last response is returned
+        retry = Retry(
+            total=4,
+            connect=1,  # A refused connection (e.g. Ollama not running) fails fast
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST", "GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Content-Type": "application/json"})
+        
+        # Providers with a static bearer token get it set once
+        if self._spec and self._spec.auth == "bearer" and self.api_key:
+            session.headers["Authorization"] = f"Bearer {self.api_key}"
+        return session
+    
     def _get_default_model(self) -> str:
         """Get default model for each provider"""
         defaults = {
@@ -37,10 +292,10 @@ class LLMEngine:
     def _get_api_key(self) -> Optional[str]:
         """Get API key from config"""
         key_map = {
-            "groq": Config.GROQ_API_KEY,
-            "huggingface": Config.HUGGINGFACE_API_KEY,
-            "gemini": Config.GEMINI_API_KEY,
-            "cohere": Config.COHERE_API_KEY,
+            "groq": CONFIG.GROQ_API_KEY,
+            "huggingface": CONFIG.HUGGINGFACE_API_KEY,
+            "gemini": CONFIG.GEMINI_API_KEY,
+            "cohere": CONFIG.COHERE_API_KEY,
             "ollama": None  # Local, no key needed
         }
         return key_map.get(self.provider)
@@ -56,7 +311,8 @@ class LLMEngine:
         }
         return urls.get(self.provider)
     
-    def generate(self, messages: List[Dict], system_prompt: str = None, temperature: float = 0.7) -> str:
+    def generate(self, messages: List[Dict], system_prompt: str = None, temperature: float = 0.7,
+                 cacheable: bool = False) -> str:
         """
         Generate response from LLM
         
@@ -64,268 +320,138 @@ class LLMEngine:
             messages: List of message dicts with 'role' and 'content'
             system_prompt: System prompt to set behavior
             temperature: Creativity (0.0 to 1.0)
+            cacheable: Allow cached/similar answers even when temperature > 0.05
             
         Returns:
             Generated text response
         """
-        try:
-            if self.provider == "groq":
-                return self._generate_groq(messages, system_prompt, temperature)
-            elif self.provider == "huggingface":
-                return self._generate_huggingface(messages, system_prompt, temperature)
-            elif self.provider == "gemini":
-                return self._generate_gemini(messages, system_prompt, temperature)
-            elif self.provider == "ollama":
-                return self._generate_ollama(messages, system_prompt, temperature)
-            elif self.provider == "cohere":
-                return self._generate_cohere(messages, system_prompt, temperature)
-            else:
-                return "Error: Unsupported provider"
-        except Exception as e:
-            return f"Error generating response: {str(e)}"
-    
-    def _generate_groq(self, messages: List[Dict], system_prompt: str, temperature: float) -> str:
-        """Generate using Groq API (OpenAI compatible)"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        if not is_cacheable(temperature, cacheable):
+            return self._generate(messages, system_prompt, temperature)[0]
         
-        # Add system prompt if provided
-        full_messages = []
-        if system_prompt:
-            full_messages.append({"role": "system", "content": system_prompt})
-        full_messages.extend(messages)
+        cached = self.cache.get(self.model, messages, system_prompt, temperature)
+        if cached is not None:
+            return cached
         
-        payload = {
-            "model": self.model,
-            "messages": full_messages,
-            "temperature": temperature,
-            "max_tokens": 2048
-        }
+        response, ok = self._generate(messages, system_prompt, temperature)
+        if ok:
+            self.cache.put(self.model, messages, system_prompt, temperature, response)
+        return response
+    
+    def _generate(self, messages: List[Dict], system_prompt: str, temperature: float) -> Tuple[str, bool]:
+        """Call the provider described by self._spec (no caching); returns (text, parsed successfully)"""
+        spec = self._spec
+        if spec is None:
+            return "Error: Unsupported provider", False
         
         try:
-            response = requests.post(self.base_url, json=payload, headers=headers, timeout=30)
+            payload = spec.payload(self.model, messages, system_prompt, temperature)
+            # Serialize once here (Content-Type is set on the session)
+            response = self.session.post(self._url, params=self._params, data=_dumps(payload), timeout=spec.timeout)
             
-            # Better error handling
             if response.status_code != 200:
-                try:
-                    error_data = response.json()
-                    error_msg = error_data.get('error', {}).get('message', 'Unknown error')
-                except:
-                    error_msg = response.text[:200]
-                
-                return f"Groq API Error ({response.status_code}): {error_msg}"
+                return self._format_http_error(response.status_code, lambda: _json.loads(response.content), response.text), False
             
-            return response.json()["choices"][0]["message"]["content"]
+            return spec.parse(_json.loads(response.content)), True
         
+        except requests.exceptions.ConnectionError as e:
+            return spec.connect_error or f"Network error: {str(e)}", False
         except requests.exceptions.Timeout:
-            return "Error: Request timed out. Check your internet connection."
+            return spec.timeout_error, False
         except requests.exceptions.RequestException as e:
-            return f"Network error: {str(e)}"
+            return f"Network error: {str(e)}", False
         except KeyError as e:
-            return f"Error parsing Groq response: Missing key {str(e)}"
+            return f"Error parsing {spec.name} response: Missing key {str(e)}", False
         except Exception as e:
-            return f"Error: {str(e)}"
+            return f"Error: {str(e)}", False
     
-    def _generate_huggingface(self, messages: List[Dict], system_prompt: str, temperature: float) -> str:
-        """Generate using Hugging Face Inference API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        # Format as single prompt
-        prompt = ""
-        if system_prompt:
-            prompt += f"<s>[INST] {system_prompt}\n\n"
-        
-        for msg in messages:
-            if msg["role"] == "user":
-                prompt += f"{msg['content']} [/INST]"
-            elif msg["role"] == "assistant":
-                prompt += f" {msg['content']} </s><s>[INST] "
-        
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": 1024,
-                "temperature": temperature,
-                "return_full_text": False
-            }
-        }
-        
+    def _format_http_error(self, status_code: int, read_json: Callable[[], Dict], text: str) -> str:
+        """Provider-specific message for a non-200 response"""
         try:
-            url = f"{self.base_url}/{self.model}"
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
-            
-            if response.status_code != 200:
-                try:
-                    error_data = response.json()
-                    error_msg = error_data.get('error', 'Unknown error')
-                except:
-                    error_msg = response.text[:200]
-                
-                return f"HuggingFace API Error ({response.status_code}): {error_msg}"
-            
-            result = response.json()
-            if isinstance(result, list):
-                return result[0]["generated_text"]
-            return result["generated_text"]
-        
-        except requests.exceptions.Timeout:
-            return "Error: Request timed out. Check your internet connection."
-        except requests.exceptions.RequestException as e:
-            return f"Network error: {str(e)}"
-        except KeyError as e:
-            return f"Error parsing HuggingFace response: Missing key {str(e)}"
-        except Exception as e:
-            return f"Error: {str(e)}"
+            error_msg = self._spec.error(read_json())
+        except Exception:
+            error_msg = text[:200]
+        return f"{self._spec.name} {self._spec.error_label} ({status_code}): {error_msg}"
     
-    def _generate_gemini(self, messages: List[Dict], system_prompt: str, temperature: float) -> str:
-        """Generate using Google Gemini API"""
-        # Gemini 1.5 models require v1beta
-        version = "v1beta" if "1.5" in self.model else "v1"
-        url = f"https://generativelanguage.googleapis.com/{version}/models/{self.model}:generateContent?key={self.api_key}"
-        
-        # Format messages for Gemini
-        contents = []
-        
-        # Add system prompt as first user message
-        if system_prompt:
-            contents.append({
-                "role": "user",
-                "parts": [{"text": system_prompt}]
-            })
-            contents.append({
-                "role": "model",
-                "parts": [{"text": "Understood. I'll follow these guidelines."}]
-            })
-        
-        for msg in messages:
-            role = "user" if msg["role"] == "user" else "model"
-            contents.append({
-                "role": role,
-                "parts": [{"text": msg["content"]}]
-            })
-        
-        payload = {
-            "contents": contents,
-            "generationConfig": {
-                "temperature": temperature,
-                "maxOutputTokens": 2048
+    # ============ ASYNC / BATCH ============
+    @property
+    def aclient(self):
+        """Shared httpx.AsyncClient (HTTP/2 when h2 is installed), created on first use"""
+        if self._aclient is None:
+            if not HTTPX_AVAILABLE:
+                raise RuntimeError("Async generation needs httpx. Run: pip install 'httpx[http2]'")
+            timeout = self._spec.timeout if self._spec else (5, 30)
+            options = {
+                "limits": httpx.Limits(max_connections=32, max_keepalive_connections=32),
+                "timeout": httpx.Timeout(timeout[1], connect=timeout[0]),
+                "headers": dict(self.session.headers),
             }
-        }
-        
-        try:
-            response = requests.post(url, json=payload, timeout=30)
-            
-            # Better error handling
-            if response.status_code != 200:
-                try:
-                    error_data = response.json()
-                    error_msg = error_data.get('error', {}).get('message', 'Unknown error')
-                except:
-                    error_msg = response.text[:200]
-                
-                return f"Gemini API Error ({response.status_code}): {error_msg}"
-            
-            data = response.json()
-            return data["candidates"][0]["content"]["parts"][0]["text"]
-        
-        except requests.exceptions.Timeout:
-            return "Error: Request timed out. Check your internet connection."
-        except requests.exceptions.RequestException as e:
-            return f"Network error: {str(e)}"
-        except KeyError as e:
-            return f"Error parsing Gemini response: Missing key {str(e)}"
-        except Exception as e:
-            return f"Error: {str(e)}"
+            try:
+                self._aclient = httpx.AsyncClient(http2=True, **options)
+            except ImportError:
+                # h2 package missing, fall back to HTTP/1.1 keep-alive
+                self._aclient = httpx.AsyncClient(**options)
+        return self._aclient
     
-    def _generate_ollama(self, messages: List[Dict], system_prompt: str, temperature: float) -> str:
-        """Generate using Ollama (local)"""
-        # Add system prompt to messages
-        full_messages = []
-        if system_prompt:
-            full_messages.append({"role": "system", "content": system_prompt})
-        full_messages.extend(messages)
+    async def agenerate(self, messages: List[Dict], system_prompt: str = None, temperature: float = 0.7) -> str:
+        """
+        Async version of generate()
         
-        payload = {
-            "model": self.model,
-            "messages": full_messages,
-            "stream": False,
-            "options": {
-                "temperature": temperature
-            }
-        }
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            system_prompt: System prompt to set behavior
+            temperature: Creativity (0.0 to 1.0)
+            
+        Returns:
+            Generated text response
+        """
+        spec = self._spec
+        if spec is None:
+            return "Error: Unsupported provider"
+        if not HTTPX_AVAILABLE:
+            return "Error: Async generation needs httpx. Run: pip install 'httpx[http2]'"
         
         try:
-            response = requests.post(self.base_url, json=payload, timeout=60)
+            payload = spec.payload(self.model, messages, system_prompt, temperature)
+            response = await self.aclient.post(self._url, params=self._params, content=_dumps(payload))
             
             if response.status_code != 200:
-                return f"Ollama Error ({response.status_code}): Is Ollama running? Start it with: ollama serve"
+                return self._format_http_error(response.status_code, lambda: _json.loads(response.content), response.text)
             
-            return response.json()["message"]["content"]
+            return spec.parse(_json.loads(response.content))
         
-        except requests.exceptions.ConnectionError:
-            return "Error: Cannot connect to Ollama. Make sure Ollama is running (ollama serve)"
-        except requests.exceptions.Timeout:
-            return "Error: Request timed out. Ollama might be processing a large model."
-        except requests.exceptions.RequestException as e:
+        except httpx.ConnectError as e:
+            return spec.connect_error or f"Network error: {str(e)}"
+        except httpx.TimeoutException:
+            return spec.timeout_error
+        except httpx.HTTPError as e:
             return f"Network error: {str(e)}"
         except KeyError as e:
-            return f"Error parsing Ollama response: Missing key {str(e)}"
+            return f"Error parsing {spec.name} response: Missing key {str(e)}"
         except Exception as e:
-            return f"Error: {str(e)}"
+            return f"Error generating response: {str(e)}"
     
-    def _generate_cohere(self, messages: List[Dict], system_prompt: str, temperature: float) -> str:
-        """Generate using Cohere API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        # Get last user message
-        user_message = messages[-1]["content"] if messages else ""
-        
-        # Format chat history
-        chat_history = []
-        for msg in messages[:-1]:
-            chat_history.append({
-                "role": "USER" if msg["role"] == "user" else "CHATBOT",
-                "message": msg["content"]
-            })
-        
-        payload = {
-            "model": self.model,
-            "message": user_message,
-            "chat_history": chat_history,
-            "preamble": system_prompt,
-            "temperature": temperature
-        }
+    async def batch_generate(self, batch: List[List[Dict]], system_prompt: str = None,
+                             temperature: float = 0.7) -> List[str]:
+        """
+        Generate responses for several independent conversations concurrently
         
-        try:
-            response = requests.post(self.base_url, json=payload, headers=headers, timeout=30)
-            
-            if response.status_code != 200:
-                try:
-                    error_data = response.json()
-                    error_msg = error_data.get('message', 'Unknown error')
-                except:
-                    error_msg = response.text[:200]
-                
-                return f"Cohere API Error ({response.status_code}): {error_msg}"
+        Args:
+            batch: List of message lists, one per conversation
+            system_prompt: System prompt shared by every conversation
+            temperature: Creativity (0.0 to 1.0)
             
-            return response.json()["text"]
-        
-        except requests.exceptions.Timeout:
-            return "Error: Request timed out. Check your internet connection."
-        except requests.exceptions.RequestException as e:
-            return f"Network error: {str(e)}"
-        except KeyError as e:
-            return f"Error parsing Cohere response: Missing key {str(e)}"
-        except Exception as e:
-            return f"Error: {str(e)}"
+        Returns:
+            Responses in the same order as batch
+        """
+        return await asyncio.gather(*[
+            self.agenerate(messages, system_prompt, temperature) for messages in batch
+        ])
+    
+    async def aclose(self):
+        """Close the async HTTP client"""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
     
     def stream_generate(self, messages: List[Dict], system_prompt: str = None):
         """
@@ -334,37 +460,26 @@ class LLMEngine:
         """
         if self.provider == "groq":
             # Groq supports streaming
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            full_messages = []
-            if system_prompt:
-                full_messages.append({"role": "system", "content": system_prompt})
-            full_messages.extend(messages)
-            
             payload = {
                 "model": self.model,
-                "messages": full_messages,
+                "messages": _with_system(messages, system_prompt),
                 "stream": True
             }
             
             try:
-                response = requests.post(self.base_url, json=payload, headers=headers, stream=True, timeout=30)
-                
-                for line in response.iter_lines():
-                    if line:
-                        line = line.decode('utf-8')
-                        if line.startswith('data: '):
-                            data = line[6:]
-                            if data != '[DONE]':
-                                import json
-                                chunk = json.loads(data)
-                                if 'choices' in chunk and len(chunk['choices']) > 0:
-                                    delta = chunk['choices'][0].get('delta', {})
-                                    if 'content' in delta:
-                                        yield delta['content']
+                # Closing the response returns its connection to the pool
+                with self.session.post(self.base_url, data=_dumps(payload), stream=True, timeout=(5, 30)) as response:
+                    # Keep raw bytes: both parsers take them without a separate decode
+                    for line in response.iter_lines(decode_unicode=False):
+                        if line:
+                            if line.startswith(b'data: '):
+                                data = line[6:]
+                                if data != b'[DONE]':
+                                    chunk = _json.loads(data)
+                                    if 'choices' in chunk and len(chunk['choices']) > 0:
+                                        delta = chunk['choices'][0].get('delta', {})
+                                        if 'content' in delta:
+                                            yield delta['content']
             except Exception as e:
                 yield f"Streaming error: {str(e)}"
         else:
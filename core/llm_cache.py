@@ -0,0 +1,228 @@
+import time
+import json
+import hashlib
+import importlib.util
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+from memory.encoder import get_shared_encoder
+
+try:
+    import numpy as np
+    SEMANTIC_CACHE_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
+
+def cache_key_exact(model: str, messages: List[Dict], system_prompt: Optional[str], temperature: float) -> str:
+    """SHA-256 over everything that determines the response"""
+    blob = json.dumps(
+        [model, messages, temperature, system_prompt or ""],
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(temperature: float, cacheable: bool = False) -> bool:
+    """Only (near-)deterministic calls are cached unless the caller opts in"""
+    return cacheable or temperature <= 0.05
+
+
+class LLMCache:
+    """Two-tier response cache: exact hash match, then embedding similarity"""
+
+    def __init__(self, backend=None, ttl: int = 3600, sim_threshold: float = 0.92,
+                 max_entries: int = 1024):
+        """
+        Args:
+            backend: Optional Redis-compatible client (get/setex) shared across processes
+            ttl: Seconds an entry stays valid
+            sim_threshold: Minimum cosine similarity for a semantic hit
+            max_entries: In-memory entries kept per tier (least recently used are dropped)
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.sim_threshold = sim_threshold
+        self.max_entries = max_entries
+
+        # exact key -> (response, expires_at)
+        self._exact: "OrderedDict[str, tuple]" = OrderedDict()
+        # scope (model + system prompt + earlier turns) -> list of (embedding, response, expires_at),
+        # least recently used scope first; max_entries caps the entries across all scopes
+        self._semantic: "OrderedDict[str, list]" = OrderedDict()
+        self._semantic_count = 0
+        self._encoder = None
+
+        self.hits = 0
+        self.misses = 0
+
+    # ============ LOOKUP ============
+    def get(self, model: str, messages: List[Dict], system_prompt: Optional[str],
+            temperature: float) -> Optional[str]:
+        """
+        Return a cached response or None
+
+        Args:
+            model: Model name
+            messages: Messages sent to the LLM
+            system_prompt: System prompt
+            temperature: Sampling temperature
+
+        Returns:
+            Cached response text, or None on a miss
+        """
+        key = cache_key_exact(model, messages, system_prompt, temperature)
+        response = self._get_exact(key)
+
+        if response is None:
+            response = self._get_semantic(model, messages, system_prompt)
+
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def _get_exact(self, key: str) -> Optional[str]:
+        entry = self._exact.get(key)
+        if entry is not None:
+            response, expires_at = entry
+            if expires_at > time.time():
+                self._exact.move_to_end(key)
+                return response
+            del self._exact[key]
+
+        if self.backend is not None:
+            try:
+                value = self.backend.get(f"yui:llm:{key}")
+            except Exception:
+                return None
+            if value is not None:
+                response = value.decode("utf-8") if isinstance(value, bytes) else value
+                self._store_exact(key, response)
+                return response
+        return None
+
+    def _get_semantic(self, model: str, messages: List[Dict], system_prompt: Optional[str]) -> Optional[str]:
+        history, text = _split_last_user(messages)
+        scope = _scope(model, system_prompt, history)
+        entries = self._semantic.get(scope)
+        if not entries:
+            return None
+
+        embedding = self._embed(text)
+        if embedding is None:
+            return None
+
+        now = time.time()
+        live = [entry for entry in entries if entry[2] > now]
+        self._semantic_count -= len(entries) - len(live)
+        if not live:
+            del self._semantic[scope]
+            return None
+        entries[:] = live
+        self._semantic.move_to_end(scope)
+
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        similarities = np.stack([entry[0] for entry in entries]) @ embedding
+        best = int(similarities.argmax())
+        if similarities[best] >= self.sim_threshold:
+            return entries[best][1]
+        return None
+
+    # ============ STORE ============
+    def put(self, model: str, messages: List[Dict], system_prompt: Optional[str],
+            temperature: float, response: str):
+        """Store a successful response (callers never pass provider/network errors)"""
+        if not response:
+            return
+
+        key = cache_key_exact(model, messages, system_prompt, temperature)
+        self._store_exact(key, response)
+
+        if self.backend is not None:
+            try:
+                self.backend.setex(f"yui:llm:{key}", self.ttl, response)
+            except Exception:
+                pass
+
+        history, text = _split_last_user(messages)
+        embedding = self._embed(text)
+        if embedding is not None:
+            now = time.time()
+            self._prune_semantic(now)
+            scope = _scope(model, system_prompt, history)
+            entries = self._semantic.setdefault(scope, [])
+            self._semantic.move_to_end(scope)
+            entries.append((embedding, response, now + self.ttl))
+            self._semantic_count += 1
+
+            # Over the cap: drop the oldest entries of the least recently used scopes
+            while self._semantic_count > self.max_entries:
+                oldest_scope, oldest = next(iter(self._semantic.items()))
+                del oldest[0]
+                self._semantic_count -= 1
+                if not oldest:
+                    del self._semantic[oldest_scope]
+
+    def _prune_semantic(self, now: float):
+        """Drop expired semantic entries and the scopes left empty (most scopes are never looked up again)"""
+        for scope in list(self._semantic):
+            entries = self._semantic[scope]
+            live = [entry for entry in entries if entry[2] > now]
+            self._semantic_count -= len(entries) - len(live)
+            if live:
+                entries[:] = live
+            else:
+                del self._semantic[scope]
+
+    def _store_exact(self, key: str, response: str):
+        self._exact[key] = (response, time.time() + self.ttl)
+        self._exact.move_to_end(key)
+        if len(self._exact) > self.max_entries:
+            self._exact.popitem(last=False)
+
+    # ============ HELPERS ============
+    def _embed(self, text: str):
+        """Normalized embedding of text (None if unavailable)"""
+        if not SEMANTIC_CACHE_AVAILABLE or not text:
+            return None
+
+        if self._encoder is None:
+            # Same process-wide model the vector memory uses
+            self._encoder = get_shared_encoder()
+        return self._encoder.encode(text, normalize_embeddings=True)
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        self._exact.clear()
+        self._semantic.clear()
+        self._semantic_count = 0
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._exact)
+        }
+
+
+def _split_last_user(messages: List[Dict]):
+    """(turns before the last user message, its text)"""
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get("role") == "user":
+            return messages[:i], messages[i]["content"]
+    return messages, ""
+
+
+def _scope(model: str, system_prompt: Optional[str], history: List[Dict]) -> str:
+    """Semantic matches only count within the same model, system prompt and earlier turns"""
+    # Without the history, short follow-ups ("why?", "tell me more") would match across conversations
+    blob = json.dumps(
+        [model, system_prompt or "", history],
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
@@ -2,9 +2,29 @@
 Emotion Detection System for Yui AI Companion
 Uses VADER sentiment analysis to detect user emotions
 """
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from typing import Dict, Tuple
+from typing import Dict, List
+from collections import deque
+from functools import lru_cache
 import re
+import threading
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# VADER loads its lexicon from disk on construction; share one instance
+_VADER = None
+_VADER_LOCK = threading.Lock()
+
+
+def _get_vader():
+    """Process-wide SentimentIntensityAnalyzer, created on first use"""
+    global _VADER
+    if _VADER is None:
+        # Detectors may be built concurrently (web server); load the lexicon only once
+        with _VADER_LOCK:
+            if _VADER is None:
+                from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+                _VADER = SentimentIntensityAnalyzer()
+    return _VADER
 
 
 class EmotionDetector:
@@ -12,7 +32,10 @@ class EmotionDetector:
     
     def __init__(self):
         """Initialize VADER sentiment analyzer"""
-        self.analyzer = SentimentIntensityAnalyzer()
+        self.analyzer = self._create_analyzer()
+        
+        # Repeated short messages ("hi", "thanks") skip VADER entirely
+        self._analyze_cached = lru_cache(maxsize=4096)(self._analyze)
         
         # Emotion keywords for better classification
         self.emotion_keywords = {
@@ -33,6 +56,21 @@ class EmotionDetector:
             'excitement': ['excited', 'thrilled', 'eager', 'pumped', 'hyped', 'enthusiastic',
                           'can\'t wait', '🔥', '⚡', '🎊'],
         }
+        
+        # Whole-word keywords as case-folded sets (matched by token intersection);
+        # emoji and multi-word phrases like "can't wait" are counted in the text
+        self._emotion_wordsets = {
+            emotion: frozenset(k.casefold() for k in keywords if k.isalpha())
+            for emotion, keywords in self.emotion_keywords.items()
+        }
+        self._emotion_phrases = {
+            emotion: tuple(k.casefold() for k in keywords if not k.isalpha())
+            for emotion, keywords in self.emotion_keywords.items()
+        }
+    
+    def _create_analyzer(self):
+        """Sentiment backend used by _polarity_scores()"""
+        return _get_vader()
     
     def analyze_emotion(self, text: str) -> Dict:
         """
@@ -44,9 +82,33 @@ class EmotionDetector:
         Returns:
             Dict with emotion, sentiment scores, and confidence
         """
-        # Get VADER sentiment scores
-        scores = self.analyzer.polarity_scores(text)
+        # Only strip: VADER treats case (e.g. "GREAT") as emphasis
+        result = self._analyze_cached(text.strip())
+        # Hand out copies so callers can't mutate the cached entry
+        return {**result, 'scores': dict(result['scores'])}
+    
+    def analyze_emotions(self, texts: List[str]) -> List[Dict]:
+        """
+        Analyze several messages (e.g. when replaying history)
         
+        Args:
+            texts: User messages
+            
+        Returns:
+            One analyze_emotion() result per text, in order
+        """
+        return [self.analyze_emotion(text) for text in texts]
+    
+    def _polarity_scores(self, text: str) -> Dict:
+        """VADER-style scores: pos, neg, neu and compound (-1 to 1)"""
+        return self.analyzer.polarity_scores(text)
+    
+    def _analyze(self, text: str) -> Dict:
+        """Uncached analysis behind analyze_emotion()"""
+        return self._build_result(text, self._polarity_scores(text))
+    
+    def _build_result(self, text: str, scores: Dict) -> Dict:
+        """Turn sentiment scores into the analyze_emotion() result"""
         # Classify emotion based on keywords
         emotion = self._classify_emotion(text, scores)
         
@@ -68,12 +130,15 @@ class EmotionDetector:
     
     def _classify_emotion(self, text: str, scores: Dict) -> str:
         """Classify specific emotion based on keywords and scores"""
-        text_lower = text.lower()
+        # casefold() handles non-English text (ß, İ) correctly; skip it when already lowercase
+        text_cf = text if text.islower() else text.casefold()
         
         # Check for specific emotion keywords
+        tokens = frozenset(_TOKEN_RE.findall(text_cf))
         emotion_matches = {}
-        for emotion, keywords in self.emotion_keywords.items():
-            matches = sum(1 for keyword in keywords if keyword in text_lower)
+        for emotion, wordset in self._emotion_wordsets.items():
+            matches = len(tokens & wordset)
+            matches += sum(1 for p in self._emotion_phrases[emotion] if p in text_cf)
             if matches > 0:
                 emotion_matches[emotion] = matches
         
@@ -149,42 +214,38 @@ class EmotionDetector:
 class EmotionState:
     """Tracks bot's emotional state for consistent personality"""
     
+    # Bot mirrors user emotions to some degree
+    _MOOD_MAPPING = {
+        'joy': 'cheerful',
+        'excitement': 'energetic',
+        'love': 'warm',
+        'sadness': 'empathetic',
+        'anger': 'calm',  # Bot stays calm when user is angry
+        'fear': 'reassuring',
+        'neutral': 'neutral'
+    }
+    
+    _TONE_INSTRUCTIONS = {
+        'cheerful': "Respond with warmth and positivity.",
+        'energetic': "Match their energy with enthusiasm!",
+        'warm': "Be extra caring and affectionate.",
+        'empathetic': "Be gentle, understanding, and supportive.",
+        'calm': "Stay calm and de-escalate. Be patient and understanding.",
+        'reassuring': "Be reassuring and help them feel safe.",
+        'neutral': "Maintain your natural personality."
+    }
+    
     def __init__(self):
         """Initialize emotion state"""
         self.current_mood = 'neutral'
-        self.mood_history = []
+        self.mood_history = deque(maxlen=10)  # Keep only last 10 moods
         self.conversation_tone = 'balanced'
     
     def update_mood(self, user_emotion: str):
         """Update bot's mood based on user emotion"""
-        # Bot mirrors user emotions to some degree
-        mood_mapping = {
-            'joy': 'cheerful',
-            'excitement': 'energetic',
-            'love': 'warm',
-            'sadness': 'empathetic',
-            'anger': 'calm',  # Bot stays calm when user is angry
-            'fear': 'reassuring',
-            'neutral': 'neutral'
-        }
-        
-        self.current_mood = mood_mapping.get(user_emotion, 'neutral')
+        self.current_mood = self._MOOD_MAPPING.get(user_emotion, 'neutral')
         self.mood_history.append(self.current_mood)
-        
-        # Keep only last 10 moods
-        if len(self.mood_history) > 10:
-            self.mood_history = self.mood_history[-10:]
     
     def get_tone_instruction(self) -> str:
         """Get instruction for bot's tone based on mood"""
-        tone_instructions = {
-            'cheerful': "Respond with warmth and positivity.",
-            'energetic': "Match their energy with enthusiasm!",
-            'warm': "Be extra caring and affectionate.",
-            'empathetic': "Be gentle, understanding, and supportive.",
-            'calm': "Stay calm and de-escalate. Be patient and understanding.",
-            'reassuring': "Be reassuring and help them feel safe.",
-            'neutral': "Maintain your natural personality."
-        }
-        
-        return tone_instructions.get(self.current_mood, "Be yourself.")
+        return self._TONE_INSTRUCTIONS.get(self.current_mood, "Be yourself.")
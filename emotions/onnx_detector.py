@@ -0,0 +1,100 @@
+"""
+ONNX sentiment backend for Yui's emotion detection
+Scores messages with an int8-quantized DistilBERT SST-2 model via onnxruntime
+"""
+from typing import Dict, List
+
+from emotions.emotion_detector import EmotionDetector
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+
+class ONNXEmotionDetector(EmotionDetector):
+    """EmotionDetector that replaces VADER scores with a DistilBERT classifier"""
+    
+    # SST-2 has no neutral class and is confident on almost everything, so the
+    # logit margin is mapped onto VADER's compound scale instead of pos - neg:
+    # margins below NEUTRAL_MARGIN (about 88% confidence) count as neutral, the
+    # rest go through VADER's own normalization x / sqrt(x^2 + alpha)
+    NEUTRAL_MARGIN = 2.0
+    COMPOUND_ALPHA = 15.0
+    
+    def __init__(self, model_path: str,
+                 tokenizer_name: str = "distilbert-base-uncased-finetuned-sst-2-english",
+                 max_length: int = 128):
+        """
+        Args:
+            model_path: Path to the quantized model (e.g. distilbert-sst2-int8.onnx)
+            tokenizer_name: Hugging Face tokenizer matching the model
+            max_length: Tokens kept per message
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("ONNX emotion detection needs: pip install onnxruntime tokenizers numpy")
+        
+        self.model_path = str(model_path)
+        self.tokenizer = Tokenizer.from_pretrained(tokenizer_name)
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        super().__init__()
+    
+    def _create_analyzer(self):
+        """ONNX inference session on the CPU provider"""
+        session = ort.InferenceSession(self.model_path, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in session.get_inputs()}
+        return session
+    
+    def analyze_emotions(self, texts: List[str]) -> List[Dict]:
+        """
+        Analyze several messages with one batched model run
+        
+        Args:
+            texts: User messages
+            
+        Returns:
+            One analyze_emotion() result per text, in order
+        """
+        if not texts:
+            return []
+        
+        stripped = [text.strip() for text in texts]
+        scores = self._batch_scores(stripped)
+        return [self._build_result(text, s) for text, s in zip(stripped, scores)]
+    
+    def _polarity_scores(self, text: str) -> Dict:
+        return self._batch_scores([text])[0]
+    
+    def _batch_scores(self, texts: List[str]) -> List[Dict]:
+        """Model outputs mapped onto VADER's score keys and ranges"""
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        inputs = {name: value for name, value in inputs.items() if name in self._input_names}
+        
+        logits = self.analyzer.run(None, inputs)[0]
+        
+        # Softmax over [negative, positive]
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs = exp / exp.sum(axis=1, keepdims=True)
+        
+        margins = logits[:, 1] - logits[:, 0]
+        
+        scores = []
+        for (neg, pos), margin in zip(probs.tolist(), margins.tolist()):
+            excess = max(abs(margin) - self.NEUTRAL_MARGIN, 0.0)
+            strength = excess / (excess * excess + self.COMPOUND_ALPHA) ** 0.5
+            # Like VADER, pos/neg/neu are proportions that sum to 1
+            scores.append({
+                'pos': pos * strength,
+                'neg': neg * strength,
+                'neu': 1.0 - strength,
+                'compound': strength if margin > 0 else -strength
+            })
+        return scores
@@ -9,16 +9,36 @@ if not api_key:
     print("No key found")
     exit()
 
-url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-response = requests.get(url)
+MODELS_FILE = "models.txt"
+ETAG_FILE = MODELS_FILE + ".etag"
 
-if response.status_code == 200:
+url = "https://generativelanguage.googleapis.com/v1beta/models"
+
+# Revalidate against the last run: a 304 means models.txt is still current
+headers = {}
+if os.path.exists(MODELS_FILE) and os.path.exists(ETAG_FILE):
+    with open(ETAG_FILE) as f:
+        headers["If-None-Match"] = f.read().strip()
+
+response = requests.get(url, params={"key": api_key}, headers=headers, timeout=10)
+
+if response.status_code == 304:
+    with open(MODELS_FILE) as f:
+        print(f.read(), end="")
+elif response.status_code == 200:
     models = response.json().get('models', [])
-    with open("models.txt", "w") as f:
+    with open(MODELS_FILE, "w") as f:
         for m in models:
             if 'generateContent' in m.get('supportedGenerationMethods', []):
                 line = f"- {m['name']} ({m.get('version', '')})"
                 print(line)
                 f.write(line + "\n")
+
+    etag = response.headers.get("ETag")
+    if etag:
+        with open(ETAG_FILE, "w") as f:
+            f.write(etag)
+    elif os.path.exists(ETAG_FILE):
+        os.remove(ETAG_FILE)
 else:
     print(f"Error: {response.status_code} - {response.text}")
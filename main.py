@@ -4,14 +4,11 @@ Yui - AI Companion Core System
 Phase 1: Basic Conversation Engine
 """
 import sys
-from rich.console import Console
-from rich.panel import Panel
-from rich.prompt import Prompt
-from rich.markdown import Markdown
-from config.config import Config
-from core.conversation import ConversationManager
+from config.config import CONFIG
 
-console = Console()
+# rich and the conversation stack (LLM, memory, emotions) are imported inside
+# main() so importing this module stays cheap; console is created there too
+console = None
 
 # Debug mode - shows more info
 DEBUG = True  # Set to False in production
@@ -23,11 +20,13 @@ def debug_print(msg):
 
 def display_welcome():
     """Display welcome message"""
+    from rich.markdown import Markdown
+    
     welcome_text = f"""
 # 🌙 Welcome to Project Yui
 
 **Version:** 0.1.0 (Phase 1 - Foundation)
-**Current Personality:** {Config.DEFAULT_PERSONALITY.title()}
+**Current Personality:** {CONFIG.DEFAULT_PERSONALITY.title()}
 
 Type your message and press Enter to chat.
 
@@ -44,6 +43,8 @@ Type your message and press Enter to chat.
 
 def display_help():
     """Display help information"""
+    from rich.markdown import Markdown
+    
     help_text = """
 # 📖 Yui Commands
 
@@ -62,10 +63,60 @@ def display_help():
 """
     console.print(Markdown(help_text))
 
+# ============ COMMANDS ============
+# Each handler gets (conversation, argument) and returns True to exit the loop
+
+def _cmd_quit(conversation, arg: str) -> bool:
+    console.print("\n👋 Goodbye! Come back soon.\n")
+    return True
+
+def _cmd_clear(conversation, arg: str) -> bool:
+    conversation.clear_history()
+    return False
+
+def _cmd_switch(conversation, arg: str) -> bool:
+    if arg:
+        personality_name = arg.split()[0]
+        try:
+            conversation.switch_personality(personality_name)
+        except Exception as e:
+            console.print(f"[red]Error: {e}[/red]")
+    else:
+        console.print("[yellow]Usage: /switch <personality>[/yellow]")
+        console.print("Available: yui, friday, jarvis")
+    return False
+
+def _cmd_help(conversation, arg: str) -> bool:
+    display_help()
+    return False
+
+def _cmd_info(conversation, arg: str) -> bool:
+    console.print(conversation.get_conversation_summary())
+    return False
+
+_COMMANDS = {
+    "/quit": _cmd_quit,
+    "/exit": _cmd_quit,
+    "/clear": _cmd_clear,
+    "/switch": _cmd_switch,
+    "/help": _cmd_help,
+    "/info": _cmd_info,
+}
+
 def main():
     """Main application loop"""
+    global console
+    from rich.console import Console
+    from rich.panel import Panel
+    from rich.prompt import Prompt
+    from core.conversation import ConversationManager
+    
+    console = Console()
     
     try:
+        # Check API keys and create data/log directories
+        CONFIG.init()
+        
         # Display welcome message
         display_welcome()
         
@@ -75,7 +126,7 @@ def main():
         
         # Initialize conversation manager
         conversation = ConversationManager(
-            personality_name=Config.DEFAULT_PERSONALITY,
+            personality_name=CONFIG.DEFAULT_PERSONALITY,
             user_name=user_name
         )
         
@@ -86,45 +137,20 @@ def main():
                 user_input = Prompt.ask(f"\n[bold cyan]{user_name}[/bold cyan]")
                 
                 # Skip empty inputs
-                if not user_input.strip():
+                stripped = user_input.strip()
+                if not stripped:
                     continue
                 
                 # Handle commands
                 if user_input.startswith('/'):
-                    command = user_input.lower().strip()
-                    
-                    if command in ['/quit', '/exit']:
-                        console.print("\n👋 Goodbye! Come back soon.\n")
-                        break
-                    
-                    elif command == '/clear':
-                        conversation.clear_history()
-                        continue
-                    
-                    elif command.startswith('/switch'):
-                        parts = command.split()
-                        if len(parts) > 1:
-                            personality_name = parts[1]
-                            try:
-                                conversation.switch_personality(personality_name)
-                            except Exception as e:
-                                console.print(f"[red]Error: {e}[/red]")
-                        else:
-                            console.print("[yellow]Usage: /switch <personality>[/yellow]")
-                            console.print("Available: yui, friday, jarvis")
-                        continue
+                    name, _, arg = stripped.lower().partition(' ')
+                    handler = _COMMANDS.get(name)
                     
-                    elif command == '/help':
-                        display_help()
-                        continue
-                    
-                    elif command == '/info':
-                        console.print(conversation.get_conversation_summary())
-                        continue
-                    
-                    else:
+                    if handler is None:
                         console.print("[yellow]Unknown command. Type /help for available commands.[/yellow]")
-                        continue
+                    elif handler(conversation, arg.strip()):
+                        break
+                    continue
                 
                 # Send message and get response
                 console.print(f"\n[bold magenta]{conversation.personality.name}[/bold magenta] is thinking...")
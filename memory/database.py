@@ -2,237 +2,747 @@
 Memory Database Manager for Yui AI Companion
 Handles persistent conversation storage using SQLite
 """
+import re
 import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, replace
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple
 from pathlib import Path
 import json
 
 
+# ============ SQL ============
+# Kept as constants so every call passes the identical string and hits the
+# connection's prepared-statement cache instead of re-parsing
+
+_SQL_CREATE_CONVERSATIONS = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        user_name TEXT NOT NULL,
+        personality TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,  -- epoch milliseconds
+        emotion TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_SQL_CREATE_USER_PROFILES = """
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_name TEXT UNIQUE NOT NULL,
+        preferences TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        last_seen DATETIME
+    )
+"""
+
+_SQL_CREATE_SESSIONS = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT UNIQUE NOT NULL,
+        user_name TEXT NOT NULL,
+        personality TEXT NOT NULL,
+        started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        ended_at DATETIME,
+        message_count INTEGER DEFAULT 0
+    )
+"""
+
+# Per-user counters kept current by triggers, so get_stats never scans conversations
+_SQL_CREATE_USER_STATS = """
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_name TEXT PRIMARY KEY,
+        total_messages INTEGER DEFAULT 0,
+        total_sessions INTEGER DEFAULT 0
+    )
+"""
+
+_SQL_CREATE_PERSONALITY_SESSIONS = """
+    CREATE TABLE IF NOT EXISTS personality_sessions (
+        user_name TEXT NOT NULL,
+        personality TEXT NOT NULL,
+        count INTEGER DEFAULT 0,
+        UNIQUE(user_name, personality)
+    )
+"""
+
+_SQL_STATS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stats_msg AFTER INSERT ON conversations BEGIN
+        INSERT INTO user_stats (user_name, total_messages) VALUES (NEW.user_name, 1)
+        ON CONFLICT(user_name) DO UPDATE SET total_messages = total_messages + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stats_session AFTER INSERT ON sessions BEGIN
+        INSERT INTO user_stats (user_name, total_sessions) VALUES (NEW.user_name, 1)
+        ON CONFLICT(user_name) DO UPDATE SET total_sessions = total_sessions + 1;
+        INSERT INTO personality_sessions (user_name, personality, count) VALUES (NEW.user_name, NEW.personality, 1)
+        ON CONFLICT(user_name, personality) DO UPDATE SET count = count + 1;
+    END
+    """,
+)
+
+_SQL_STATS_EXIST = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'"
+
+# Seed the counters from rows written before the stats tables existed
+_SQL_STATS_BACKFILL = (
+    """
+    INSERT INTO user_stats (user_name, total_messages, total_sessions)
+    SELECT user_name, SUM(is_message), SUM(is_session)
+    FROM (
+        SELECT user_name, 1 AS is_message, 0 AS is_session FROM conversations
+        UNION ALL
+        SELECT user_name, 0, 1 FROM sessions
+    )
+    GROUP BY user_name
+    """,
+    """
+    INSERT INTO personality_sessions (user_name, personality, count)
+    SELECT user_name, personality, COUNT(*)
+    FROM sessions
+    GROUP BY user_name, personality
+    """,
+)
+
+# Columns of conversations, in order (used to rebuild the table on migration)
+_CONVERSATION_COLUMNS = "id, session_id, user_name, personality, role, content, timestamp, emotion, created_at"
+
+# History lookups filter by session/user and read the newest rows first
+# (id breaks ties between messages saved in the same millisecond)
+_SQL_CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_conv_session_ts ON conversations(session_id, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_conv_user_ts ON conversations(user_name, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_name)",
+)
+
+_SQL_INDEXES_EXIST = "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_conv_session_ts'"
+
+# Full-text index over conversations.content (external content, kept in sync by triggers)
+_SQL_CREATE_FTS = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+        content,
+        content='conversations',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+_SQL_FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_ai AFTER INSERT ON conversations BEGIN
+        INSERT INTO conversations_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_ad AFTER DELETE ON conversations BEGIN
+        INSERT INTO conversations_fts(conversations_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_au AFTER UPDATE ON conversations BEGIN
+        INSERT INTO conversations_fts(conversations_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO conversations_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+)
+
+_SQL_FTS_EXISTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations_fts'"
+
+# Index rows written before the FTS table existed
+_SQL_FTS_REBUILD = "INSERT INTO conversations_fts(conversations_fts) VALUES ('rebuild')"
+
+_SQL_INSERT_MSG = """
+    INSERT INTO conversations 
+    (session_id, user_name, personality, role, content, emotion, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# sessions.message_count is maintained inside the INSERT itself
+_SQL_CREATE_MSG_COUNT_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS trg_msg_count AFTER INSERT ON conversations BEGIN
+        UPDATE sessions SET message_count = message_count + 1 WHERE session_id = NEW.session_id;
+    END
+"""
+
+_SQL_SESSION_HISTORY = """
+    SELECT role, content, timestamp, emotion
+    FROM conversations
+    WHERE session_id = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
+_SQL_USER_HISTORY = """
+    SELECT session_id, personality, role, content, timestamp, emotion
+    FROM conversations
+    WHERE user_name = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
+# An existing session_id is left untouched (no row, no trigger, no error)
+_SQL_INSERT_SESSION = """
+    INSERT OR IGNORE INTO sessions (session_id, user_name, personality)
+    VALUES (?, ?, ?)
+"""
+
+_SQL_END_SESSION = """
+    UPDATE sessions
+    SET ended_at = CURRENT_TIMESTAMP
+    WHERE session_id = ?
+"""
+
+_SQL_GET_PROFILE = """
+    SELECT id, user_name, preferences, last_seen
+    FROM user_profiles
+    WHERE user_name = ?
+"""
+
+_SQL_INSERT_PROFILE = """
+    INSERT INTO user_profiles (user_name, preferences, last_seen)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+"""
+
+_SQL_TOUCH_PROFILE = """
+    UPDATE user_profiles
+    SET last_seen = CURRENT_TIMESTAMP
+    WHERE user_name = ?
+"""
+
+_SQL_UPDATE_PREFERENCES = """
+    UPDATE user_profiles
+    SET preferences = ?
+    WHERE user_name = ?
+"""
+
+_SQL_SEARCH_FTS = """
+    SELECT c.session_id, c.personality, c.role, c.content, c.timestamp
+    FROM conversations_fts f
+    JOIN conversations c ON c.id = f.rowid
+    WHERE c.user_name = ? AND conversations_fts MATCH ?
+    ORDER BY bm25(conversations_fts)
+    LIMIT ?
+"""
+
+_SQL_SEARCH = """
+    SELECT session_id, personality, role, content, timestamp
+    FROM conversations
+    WHERE user_name = ? AND content LIKE ?
+    ORDER BY timestamp DESC
+    LIMIT ?
+"""
+
+_SQL_USER_STATS = """
+    SELECT total_messages, total_sessions
+    FROM user_stats
+    WHERE user_name = ?
+"""
+
+_SQL_FAVORITE_PERSONALITY = """
+    SELECT personality
+    FROM personality_sessions
+    WHERE user_name = ?
+    ORDER BY count DESC
+    LIMIT 1
+"""
+
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def _row_to_dict(row: sqlite3.Row) -> Dict:
+    """Row as a dict, with the epoch-ms timestamp turned back into ISO format"""
+    data = dict(row)
+    if isinstance(data.get('timestamp'), int):
+        data['timestamp'] = datetime.fromtimestamp(data['timestamp'] / 1000).isoformat()
+    return data
+
+
+def _fts_query(keyword: str) -> str:
+    """Quote each word so user input is never parsed as FTS5 query syntax"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in keyword.split())
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _fts_any_prefix_query(text: str) -> str:
+    """Match rows containing any word of free text as a prefix (BM25 ranks the best overlap first)"""
+    return " OR ".join(f'"{word}"*' for word in _WORD_RE.findall(text))
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    """A user's profile row (preferences JSON is only parsed when read)"""
+    id: int
+    user_name: str
+    last_seen: Optional[str]
+    _raw_prefs: Optional[str] = None
+    
+    @property
+    def preferences(self) -> Dict:
+        return json.loads(self._raw_prefs or "{}")
+
+
 class DatabaseManager:
     """Manages SQLite database for conversation history and user profiles"""
     
+    # Write-behind queue: flush when this many messages are pending...
+    WRITE_BATCH_SIZE = 64
+    # ...or when the oldest pending message has waited this long (seconds)
+    WRITE_BATCH_INTERVAL = 0.2
+    # Seconds a cached get_stats() result stays valid if nothing was written
+    STATS_TTL = 60
+    # Minimum seconds between last_seen writes for the same user
+    LAST_SEEN_INTERVAL = 30
+    
     def __init__(self, db_path: str = "data/yui_memory.db"):
         """Initialize database connection"""
         # Create data directory if it doesn't exist
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         
         self.db_path = db_path
-        self.conn = None
-        self.cursor = None
-        self._connect()
+        self.fts_enabled = False
+        
+        # One connection per thread (opened on first use) so readers don't
+        # contend on a shared connection; WAL lets them run alongside the writer
+        self._tls = threading.local()
+        self._connections = []  # (weakref to owning thread, connection)
+        self._connections_lock = threading.Lock()
+        self._closed = False
+        
+        # Read caches keyed by user_name (profiles are write-through, stats expire
+        # after STATS_TTL or as soon as the user writes a message/session)
+        self._profile_cache: Dict[str, UserProfile] = {}
+        self._stats_cache: Dict[str, Tuple[float, Dict]] = {}
+        self._stats_dirty = set()
+        # user_name -> monotonic time last_seen was last written
+        self._last_seen_written: Dict[str, float] = {}
+        
+        # Queued conversation rows, written in one transaction by a background thread
+        self._pending = deque()
+        self._pending_since = 0.0
+        self._write_cond = threading.Condition()
+        self._db_lock = threading.RLock()  # Lets flush() wait for a batch being committed
+        self._writer = None
+        self._closing = False
+        
         self._create_tables()
     
-    def _connect(self):
-        """Connect to SQLite database"""
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        self.cursor = self.conn.cursor()
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new tuned SQLite connection"""
+        # check_same_thread=False only so close() can close other threads' connections
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        
+        # WAL: commits append to the log instead of fsyncing the main file, and
+        # readers keep working while a write is in progress. synchronous=NORMAL
+        # is safe under WAL (a power loss can only drop the latest commits).
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+    
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._tls, "conn", None)
+        if conn is None:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+            conn = self._connect()
+            self._tls.conn = conn
+            with self._connections_lock:
+                # Drop connections whose threads have exited
+                alive = []
+                for thread_ref, other in self._connections:
+                    if thread_ref() is None or not thread_ref().is_alive():
+                        other.close()
+                    else:
+                        alive.append((thread_ref, other))
+                alive.append((weakref.ref(threading.current_thread()), conn))
+                self._connections = alive
+        return conn
     
     def _create_tables(self):
         """Create database tables if they don't exist"""
+        conn = self._conn()
         
-        # Conversations table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                user_name TEXT NOT NULL,
-                personality TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                emotion TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # User profiles table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_name TEXT UNIQUE NOT NULL,
-                preferences TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_seen DATETIME
-            )
-        """)
-        
-        # Sessions table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT UNIQUE NOT NULL,
-                user_name TEXT NOT NULL,
-                personality TEXT NOT NULL,
-                started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                ended_at DATETIME,
-                message_count INTEGER DEFAULT 0
-            )
-        """)
+        conn.execute(_SQL_CREATE_CONVERSATIONS)
+        conn.execute(_SQL_CREATE_USER_PROFILES)
+        conn.execute(_SQL_CREATE_SESSIONS)
+        self._migrate_timestamps(conn)
+        conn.execute(_SQL_CREATE_MSG_COUNT_TRIGGER)
+        
+        stats_existed = conn.execute(_SQL_STATS_EXIST).fetchone() is not None
+        conn.execute(_SQL_CREATE_USER_STATS)
+        conn.execute(_SQL_CREATE_PERSONALITY_SESSIONS)
+        for trigger in _SQL_STATS_TRIGGERS:
+            conn.execute(trigger)
+        if not stats_existed:
+            for backfill in _SQL_STATS_BACKFILL:
+                conn.execute(backfill)
+        
+        indexes_existed = conn.execute(_SQL_INDEXES_EXIST).fetchone() is not None
+        for index in _SQL_CREATE_INDEXES:
+            conn.execute(index)
+        if not indexes_existed:
+            # Give the planner statistics for the new indexes
+            conn.execute("ANALYZE")
+        
+        # Keyword search index (falls back to LIKE if SQLite lacks FTS5)
+        try:
+            fts_existed = conn.execute(_SQL_FTS_EXISTS).fetchone() is not None
+            conn.execute(_SQL_CREATE_FTS)
+            for trigger in _SQL_FTS_TRIGGERS:
+                conn.execute(trigger)
+            if not fts_existed:
+                conn.execute(_SQL_FTS_REBUILD)
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+        
+        conn.commit()
+    
+    def _migrate_timestamps(self, conn: sqlite3.Connection):
+        """Rebuild conversations from ISO-text timestamps to INTEGER epoch ms (older databases)"""
+        columns = {row['name']: row['type'] for row in conn.execute("PRAGMA table_info(conversations)")}
+        if columns.get('timestamp', '').upper() == 'INTEGER':
+            return
         
-        self.conn.commit()
+        rows = []
+        for row in conn.execute(f"SELECT {_CONVERSATION_COLUMNS} FROM conversations"):
+            row = list(row)
+            try:
+                row[6] = int(datetime.fromisoformat(row[6]).timestamp() * 1000)
+            except (TypeError, ValueError):
+                row[6] = _now_ms()
+            rows.append(row)
+        
+        # Dropping the old table also drops its indexes and triggers; _create_tables recreates them.
+        # Row ids are kept, so the FTS index still points at the right rows.
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE conversations")
+        conn.execute(_SQL_CREATE_CONVERSATIONS)
+        conn.executemany(
+            f"INSERT INTO conversations ({_CONVERSATION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
     
     def save_message(self, session_id: str, user_name: str, personality: str,
-                    role: str, content: str, emotion: Optional[str] = None):
-        """Save a message to the database"""
-        timestamp = datetime.now().isoformat()
+                    role: str, content: str, emotion: Optional[str] = None,
+                    timestamp: Optional[int] = None):
+        """Save a message to the database (timestamp in epoch milliseconds, defaults to now)"""
+        timestamp = timestamp or _now_ms()
         
-        self.cursor.execute("""
-            INSERT INTO conversations 
-            (session_id, user_name, personality, role, content, timestamp, emotion)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (session_id, user_name, personality, role, content, timestamp, emotion))
+        self._write_rows([(session_id, user_name, personality, role, content, emotion, timestamp)])
+    
+    def save_messages(self, session_id: str, user_name: str, rows: List[Tuple]):
+        """
+        Save several messages in a single transaction
         
-        # Update session message count
-        self.cursor.execute("""
-            UPDATE sessions 
-            SET message_count = message_count + 1
-            WHERE session_id = ?
-        """, (session_id,))
+        Args:
+            rows: (role, content, personality, emotion, timestamp) tuples,
+                  timestamp in epoch milliseconds
+        """
+        if not rows:
+            return
         
-        self.conn.commit()
+        self._write_rows([(session_id, user_name, personality, role, content, emotion, timestamp)
+                          for role, content, personality, emotion, timestamp in rows])
+    
+    # ============ WRITE-BEHIND QUEUE ============
+    def save_message_async(self, session_id: str, user_name: str, personality: str,
+                           role: str, content: str, emotion: Optional[str] = None,
+                           timestamp: Optional[int] = None):
+        """Queue a message; it is written with others in a single transaction"""
+        self.save_messages_async(session_id, user_name, [
+            (role, content, personality, emotion, timestamp or _now_ms())
+        ])
+    
+    def save_messages_async(self, session_id: str, user_name: str, rows: List[Tuple]):
+        """
+        Queue several messages for the background writer
+        
+        Args:
+            rows: (role, content, personality, emotion, timestamp) tuples,
+                  timestamp in epoch milliseconds
+        """
+        if not rows:
+            return
+        
+        with self._write_cond:
+            was_empty = not self._pending
+            self._pending.extend(
+                (session_id, user_name, personality, role, content, emotion, timestamp)
+                for role, content, personality, emotion, timestamp in rows
+            )
+            if was_empty:
+                self._pending_since = time.monotonic()
+            self._stats_dirty.add(user_name)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="yui-db-writer", daemon=True)
+                self._writer.start()
+            self._write_cond.notify()
+    
+    def flush(self):
+        """Write every queued message now (call before reading or closing)"""
+        # Holding the DB lock also waits out a batch the writer is committing
+        with self._db_lock:
+            self._write_rows(self._take_pending())
+    
+    def _take_pending(self) -> List[Tuple]:
+        with self._write_cond:
+            batch = list(self._pending)
+            self._pending.clear()
+        return batch
+    
+    def _writer_loop(self):
+        """Background thread: wait for a full batch or the interval, then write"""
+        while True:
+            with self._write_cond:
+                while not self._pending and not self._closing:
+                    self._write_cond.wait()
+                if self._closing:
+                    return
+                # Give a burst a short window to fill the batch
+                deadline = self._pending_since + self.WRITE_BATCH_INTERVAL
+                while len(self._pending) < self.WRITE_BATCH_SIZE and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._write_cond.wait(remaining)
+            try:
+                with self._db_lock:
+                    self._write_rows(self._take_pending())
+            except sqlite3.Error as e:
+                print(f"⚠️ Failed to write queued messages: {e}")
+    
+    def _write_rows(self, batch: List[Tuple]):
+        """Insert full conversation rows in one transaction (trg_msg_count bumps the counts)"""
+        if not batch:
+            return
+        
+        self._stats_dirty.update(row[1] for row in batch)
+        
+        # Refresh last_seen in the same commit (throttled per user)
+        touch = self._due_last_seen({row[1] for row in batch})
+        
+        conn = self._conn()
+        with self._db_lock:
+            with conn:  # BEGIN ... COMMIT (ROLLBACK on error)
+                conn.executemany(_SQL_INSERT_MSG, batch)
+                if touch:
+                    conn.executemany(_SQL_TOUCH_PROFILE, [(user_name,) for user_name in touch])
+    
+    def _due_last_seen(self, user_names) -> List[str]:
+        """Users whose last_seen is older than LAST_SEEN_INTERVAL (marked as written now)"""
+        now = time.monotonic()
+        due = [user_name for user_name in user_names
+               if now - self._last_seen_written.get(user_name, float('-inf')) > self.LAST_SEEN_INTERVAL]
+        for user_name in due:
+            self._last_seen_written[user_name] = now
+        return due
     
     def get_session_history(self, session_id: str, limit: int = 50) -> List[Dict]:
         """Get conversation history for a session"""
-        self.cursor.execute("""
-            SELECT role, content, timestamp, emotion
-            FROM conversations
-            WHERE session_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (session_id, limit))
+        messages = list(self.iter_session_history(session_id, limit))
+        messages.reverse()  # Return in chronological order
+        return messages
+    
+    def iter_session_history(self, session_id: str, limit: int = 50) -> Iterator[Dict]:
+        """
+        Yield a session's messages newest first, one row at a time
         
-        messages = [dict(row) for row in self.cursor.fetchall()]
-        return list(reversed(messages))  # Return in chronological order
+        Args:
+            session_id: Session to read
+            limit: Maximum number of messages
+            
+        Returns:
+            Iterator of message dicts (callers may stop early, e.g. at a token budget)
+        """
+        conn = self._conn()
+        self.flush()
+        for row in conn.execute(_SQL_SESSION_HISTORY, (session_id, limit)):
+            yield _row_to_dict(row)
     
     def get_user_history(self, user_name: str, limit: int = 100) -> List[Dict]:
         """Get all conversation history for a user"""
-        self.cursor.execute("""
-            SELECT session_id, personality, role, content, timestamp, emotion
-            FROM conversations
-            WHERE user_name = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (user_name, limit))
-        
-        return [dict(row) for row in self.cursor.fetchall()]
+        return list(self.iter_user_history(user_name, limit))
+    
+    def iter_user_history(self, user_name: str, limit: int = 100) -> Iterator[Dict]:
+        """Yield a user's messages across all sessions, newest first"""
+        conn = self._conn()
+        self.flush()
+        for row in conn.execute(_SQL_USER_HISTORY, (user_name, limit)):
+            yield _row_to_dict(row)
     
     def create_session(self, session_id: str, user_name: str, personality: str):
         """Create a new conversation session"""
-        try:
-            self.cursor.execute("""
-                INSERT INTO sessions (session_id, user_name, personality)
-                VALUES (?, ?, ?)
-            """, (session_id, user_name, personality))
-            self.conn.commit()
-        except sqlite3.IntegrityError:
-            # Session already exists
-            pass
+        conn = self._conn()
+        with self._db_lock:
+            inserted = conn.execute(_SQL_INSERT_SESSION, (session_id, user_name, personality)).rowcount
+            conn.commit()
+        if inserted:
+            self._stats_dirty.add(user_name)
     
     def end_session(self, session_id: str):
         """Mark a session as ended"""
-        self.cursor.execute("""
-            UPDATE sessions
-            SET ended_at = CURRENT_TIMESTAMP
-            WHERE session_id = ?
-        """, (session_id,))
-        self.conn.commit()
-    
-    def get_or_create_user_profile(self, user_name: str) -> Dict:
+        conn = self._conn()
+        self.flush()
+        with self._db_lock:
+            conn.execute(_SQL_END_SESSION, (session_id,))
+            conn.commit()
+    
+    def get_or_create_user_profile(self, user_name: str) -> UserProfile:
         """Get or create user profile"""
-        self.cursor.execute("""
-            SELECT * FROM user_profiles WHERE user_name = ?
-        """, (user_name,))
-        
-        profile = self.cursor.fetchone()
-        
-        if not profile:
-            # Create new profile
-            self.cursor.execute("""
-                INSERT INTO user_profiles (user_name, preferences, last_seen)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            """, (user_name, json.dumps({})))
-            self.conn.commit()
-            
-            # Fetch the newly created profile
-            self.cursor.execute("""
-                SELECT * FROM user_profiles WHERE user_name = ?
-            """, (user_name,))
-            profile = self.cursor.fetchone()
-        else:
-            # Update last_seen
-            self.cursor.execute("""
-                UPDATE user_profiles
-                SET last_seen = CURRENT_TIMESTAMP
-                WHERE user_name = ?
-            """, (user_name,))
-            self.conn.commit()
-        
-        return dict(profile)
+        cached = self._profile_cache.get(user_name)
+        if cached is not None:
+            return cached
+        
+        conn = self._conn()
+        profile = conn.execute(_SQL_GET_PROFILE, (user_name,)).fetchone()
+        
+        with self._db_lock:
+            if not profile:
+                # Create new profile (last_seen is set by the INSERT)
+                conn.execute(_SQL_INSERT_PROFILE, (user_name, json.dumps({})))
+                conn.commit()
+                self._last_seen_written[user_name] = time.monotonic()
+                
+                # Fetch the newly created profile
+                profile = conn.execute(_SQL_GET_PROFILE, (user_name,)).fetchone()
+            elif self._due_last_seen((user_name,)):
+                # Update last_seen
+                conn.execute(_SQL_TOUCH_PROFILE, (user_name,))
+                conn.commit()
+        
+        profile = UserProfile(
+            id=profile['id'],
+            user_name=profile['user_name'],
+            last_seen=profile['last_seen'],
+            _raw_prefs=profile['preferences']
+        )
+        self._profile_cache[user_name] = profile
+        return profile
     
     def update_user_preferences(self, user_name: str, preferences: Dict):
         """Update user preferences"""
-        self.cursor.execute("""
-            UPDATE user_profiles
-            SET preferences = ?
-            WHERE user_name = ?
-        """, (json.dumps(preferences), user_name))
-        self.conn.commit()
+        raw_prefs = json.dumps(preferences)
+        conn = self._conn()
+        with self._db_lock:
+            conn.execute(_SQL_UPDATE_PREFERENCES, (raw_prefs, user_name))
+            conn.commit()
+        
+        # Write through to the cached profile
+        cached = self._profile_cache.get(user_name)
+        if cached is not None:
+            self._profile_cache[user_name] = replace(cached, _raw_prefs=raw_prefs)
     
     def search_conversations(self, user_name: str, keyword: str, limit: int = 20) -> List[Dict]:
-        """Search conversations by keyword"""
-        self.cursor.execute("""
-            SELECT session_id, personality, role, content, timestamp
-            FROM conversations
-            WHERE user_name = ? AND content LIKE ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (user_name, f'%{keyword}%', limit))
+        """Search conversations by keyword (best BM25 matches first when FTS5 is available)"""
+        conn = self._conn()
+        self.flush()
+        
+        query = _fts_query(keyword)
+        if self.fts_enabled and query:
+            try:
+                rows = conn.execute(_SQL_SEARCH_FTS, (user_name, query, limit)).fetchall()
+                return [_row_to_dict(row) for row in rows]
+            except sqlite3.OperationalError:
+                pass
+        
+        rows = conn.execute(_SQL_SEARCH, (user_name, f'%{keyword}%', limit)).fetchall()
         
-        return [dict(row) for row in self.cursor.fetchall()]
+        return [_row_to_dict(row) for row in rows]
+    
+    def fts_search(self, user_name: str, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Full-text search for free text such as a whole chat message
+        
+        Args:
+            user_name: Whose conversations to search
+            query: Raw text; any of its words may match (as a prefix)
+            limit: Maximum number of results
+            
+        Returns:
+            Matching messages, best BM25 matches first (same shape as search_conversations)
+        """
+        fts_query = _fts_any_prefix_query(query)
+        if not self.fts_enabled or not fts_query:
+            return self.search_conversations(user_name, query, limit)
+        
+        conn = self._conn()
+        self.flush()
+        try:
+            rows = conn.execute(_SQL_SEARCH_FTS, (user_name, fts_query, limit)).fetchall()
+        except sqlite3.OperationalError:
+            return self.search_conversations(user_name, query, limit)
+        return [_row_to_dict(row) for row in rows]
     
     def get_stats(self, user_name: str) -> Dict:
-        """Get user statistics"""
-        # Total messages
-        self.cursor.execute("""
-            SELECT COUNT(*) as total_messages
-            FROM conversations
-            WHERE user_name = ?
-        """, (user_name,))
-        total_messages = self.cursor.fetchone()['total_messages']
-        
-        # Total sessions
-        self.cursor.execute("""
-            SELECT COUNT(*) as total_sessions
-            FROM sessions
-            WHERE user_name = ?
-        """, (user_name,))
-        total_sessions = self.cursor.fetchone()['total_sessions']
+        """Get user statistics (cached for STATS_TTL seconds unless the user wrote since)"""
+        cached = self._stats_cache.get(user_name)
+        if (cached is not None and user_name not in self._stats_dirty
+                and time.monotonic() - cached[0] < self.STATS_TTL):
+            return dict(cached[1])
+        
+        # Clear the flag before reading so a write that lands meanwhile re-marks it
+        self._stats_dirty.discard(user_name)
+        conn = self._conn()
+        self.flush()
+        # Totals (maintained by triggers)
+        counts = conn.execute(_SQL_USER_STATS, (user_name,)).fetchone()
         
         # Favorite personality
-        self.cursor.execute("""
-            SELECT personality, COUNT(*) as count
-            FROM sessions
-            WHERE user_name = ?
-            GROUP BY personality
-            ORDER BY count DESC
-            LIMIT 1
-        """, (user_name,))
-        fav_result = self.cursor.fetchone()
+        fav_result = conn.execute(_SQL_FAVORITE_PERSONALITY, (user_name,)).fetchone()
         favorite_personality = fav_result['personality'] if fav_result else 'None'
         
-        return {
-            'total_messages': total_messages,
-            'total_sessions': total_sessions,
+        stats = {
+            'total_messages': counts['total_messages'] if counts else 0,
+            'total_sessions': counts['total_sessions'] if counts else 0,
             'favorite_personality': favorite_personality
         }
+        self._stats_cache[user_name] = (time.monotonic(), stats)
+        return dict(stats)
     
     def close(self):
         """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        if not self._closed:
+            # Stop the writer and write whatever it had not picked up yet
+            with self._write_cond:
+                self._closing = True
+                self._write_cond.notify_all()
+            if self._writer is not None and self._writer is not threading.current_thread():
+                self._writer.join(timeout=5)
+            self.flush()
+            try:
+                # Refresh planner statistics if needed, then fold the WAL back into the database file
+                conn = self._conn()
+                conn.execute("PRAGMA optimize")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+            
+            self._closed = True
+            with self._connections_lock:
+                for _, conn in self._connections:
+                    conn.close()
+                self._connections = []
     
     def __del__(self):
         """Cleanup on deletion"""
-        self.close()
+        if hasattr(self, "_closed"):
+            self.close()
@@ -0,0 +1,19 @@
+"""
+Shared sentence encoder for Yui AI Companion
+One SentenceTransformer per process, used by vector memory and the LLM response cache
+"""
+import threading
+
+_ENCODER = None
+_ENCODER_LOCK = threading.Lock()
+
+
+def get_shared_encoder():
+    """Process-wide SentenceTransformer, loaded on first use"""
+    global _ENCODER
+    if _ENCODER is None:
+        with _ENCODER_LOCK:
+            if _ENCODER is None:
+                from sentence_transformers import SentenceTransformer
+                _ENCODER = SentenceTransformer('all-MiniLM-L6-v2')  # lightweight model
+    return _ENCODER
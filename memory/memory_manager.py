@@ -3,13 +3,33 @@ Memory Manager for Yui AI Companion
 Combines SQLite persistence with ChromaDB vector search for semantic memory
 """
 import uuid
-from typing import List, Dict, Optional
+import time
+import queue
+import threading
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 
 from memory.database import DatabaseManager
+from memory.encoder import get_shared_encoder
+
+# Shared by every MemoryManager: one Chroma client (the encoder is shared via memory.encoder)
+_CHROMA_CLIENT = None
+_SHARED_LOCK = threading.Lock()
+
+
+def _get_chroma_client():
+    """Process-wide Chroma client, persisted on disk"""
+    global _CHROMA_CLIENT
+    if _CHROMA_CLIENT is None:
+        with _SHARED_LOCK:
+            if _CHROMA_CLIENT is None:
+                _CHROMA_CLIENT = chromadb.PersistentClient(
+                    path="data/chroma_db",
+                    settings=Settings(anonymized_telemetry=False)
+                )
+    return _CHROMA_CLIENT
 
 
 class MemoryManager:
@@ -20,46 +40,81 @@ class MemoryManager:
     - User profiles and preferences
     """
     
+    # The vector worker embeds and adds up to this many user messages at once...
+    VECTOR_BATCH_SIZE = 32
+    # ...waiting at most this long (seconds) for a batch to fill
+    VECTOR_BATCH_INTERVAL = 0.25
+    # Messages that may wait for the worker before save_message blocks
+    VECTOR_QUEUE_SIZE = 512
+    
     def __init__(self, user_name: str, session_id: Optional[str] = None):
         """Initialize memory system"""
         self.user_name = user_name
         self.session_id = session_id or str(uuid.uuid4())
         
+        # (document, metadata, id) items waiting for the background vector worker
+        self._vec_queue: "queue.Queue[Optional[Tuple[str, Dict, str]]]" = queue.Queue(maxsize=self.VECTOR_QUEUE_SIZE)
+        self._vec_worker: Optional[threading.Thread] = None
+        self._vec_lock = threading.Lock()
+        self._closed = False
+        
         # Initialize database
         self.db = DatabaseManager()
         
         # Initialize vector database for semantic search
         try:
-            self.chroma_client = chromadb.Client(Settings(
-                persist_directory="data/chroma_db",
-                anonymized_telemetry=False
-            ))
+            self.chroma_client = _get_chroma_client()
             
-            # Create or get collection for this user
+            # One collection for all users, partitioned by the "user" metadata field
+            # (embeddings always come from the shared encoder, so Chroma never loads
+            # its own embedding model)
             self.collection = self.chroma_client.get_or_create_collection(
-                name=f"memories_{self.user_name.lower().replace(' ', '_')}",
-                metadata={"user": self.user_name}
+                name="memories",
+                embedding_function=None
             )
-            
-            # Load sentence transformer for embeddings (lightweight model)
-            self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
             self.vector_enabled = True
+            self._migrate_user_collection()
             
         except Exception as e:
             print(f"⚠️ Vector memory disabled: {e}")
             self.vector_enabled = False
             self.collection = None
-            self.encoder = None
         
         # Load user profile
         self.user_profile = self.db.get_or_create_user_profile(user_name)
     
+    def _migrate_user_collection(self):
+        """Move memories from the old per-user collection into the shared one"""
+        legacy_name = f"memories_{self.user_name.lower().replace(' ', '_')}"
+        try:
+            legacy = self.chroma_client.get_collection(name=legacy_name, embedding_function=None)
+        except Exception:
+            return  # Nothing to migrate
+        
+        try:
+            data = legacy.get(include=["documents", "embeddings", "metadatas"])
+            if data["ids"]:
+                self.collection.add(
+                    ids=data["ids"],
+                    documents=data["documents"],
+                    embeddings=data["embeddings"],
+                    metadatas=[{**(meta or {}), "user": self.user_name} for meta in data["metadatas"]]
+                )
+            self.chroma_client.delete_collection(name=legacy_name)
+        except Exception as e:
+            print(f"⚠️ Could not migrate old vector memories: {e}")
+    
+    @property
+    def encoder(self):
+        """Shared sentence encoder (loaded on first embedding, None if vector memory is off)"""
+        return get_shared_encoder() if self.vector_enabled else None
+    
     def start_session(self, personality: str):
         """Start a new conversation session"""
         self.db.create_session(self.session_id, self.user_name, personality)
     
     def save_message(self, role: str, content: str, personality: str, 
-                    emotion: Optional[str] = None):
+                    emotion: Optional[str] = None, timestamp: Optional[float] = None):
         """
         Save message to both database and vector store
         
@@ -68,32 +123,126 @@ class MemoryManager:
             content: Message content
             personality: Current personality name
             emotion: Detected emotion (optional)
+            timestamp: Epoch seconds when the message was sent (defaults to now)
         """
-        # Save to SQL database
-        self.db.save_message(
+        sent_at = datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
+        iso_timestamp = sent_at.isoformat()
+        
+        # Queue for the SQL database (written in batches by its background writer)
+        self.db.save_message_async(
             session_id=self.session_id,
             user_name=self.user_name,
             personality=personality,
             role=role,
             content=content,
-            emotion=emotion
+            emotion=emotion,
+            timestamp=int(sent_at.timestamp() * 1000)
         )
         
-        # Save to vector database for semantic search
+        # Queue for the vector database (semantic search)
         if self.vector_enabled and role == "user":  # Only index user messages
-            try:
-                self.collection.add(
-                    documents=[content],
-                    metadatas=[{
-                        "session_id": self.session_id,
-                        "personality": personality,
-                        "timestamp": datetime.now().isoformat(),
-                        "emotion": emotion or "neutral"
-                    }],
-                    ids=[f"{self.session_id}_{datetime.now().timestamp()}"]
-                )
-            except Exception as e:
-                print(f"⚠️ Failed to save to vector memory: {e}")
+            self._queue_vectors(
+                [content],
+                [{
+                    "user": self.user_name,
+                    "session_id": self.session_id,
+                    "personality": personality,
+                    "timestamp": iso_timestamp,
+                    "emotion": emotion or "neutral"
+                }],
+                [uuid.uuid4().hex]
+            )
+    
+    def save_messages(self, rows: List[Tuple]):
+        """
+        Save several messages in one database transaction
+        
+        Args:
+            rows: (role, content, personality, emotion, timestamp) tuples,
+                  timestamp in epoch seconds
+        """
+        if not rows:
+            return
+        
+        db_rows = []
+        vector_docs, vector_metas, vector_ids = [], [], []
+        for role, content, personality, emotion, timestamp in rows:
+            sent_at = datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
+            iso_timestamp = sent_at.isoformat()
+            db_rows.append((role, content, personality, emotion, int(sent_at.timestamp() * 1000)))
+            if role == "user":  # Only index user messages
+                vector_docs.append(content)
+                vector_metas.append({
+                    "user": self.user_name,
+                    "session_id": self.session_id,
+                    "personality": personality,
+                    "timestamp": iso_timestamp,
+                    "emotion": emotion or "neutral"
+                })
+                vector_ids.append(uuid.uuid4().hex)
+        
+        # Queue for the SQL database (written in batches by its background writer)
+        self.db.save_messages_async(self.session_id, self.user_name, db_rows)
+        
+        # Queue for the vector database (semantic search)
+        if self.vector_enabled and vector_docs:
+            self._queue_vectors(vector_docs, vector_metas, vector_ids)
+    
+    # ============ BACKGROUND VECTOR WORKER ============
+    def _queue_vectors(self, docs: List[str], metas: List[Dict], ids: List[str]):
+        """Hand documents to the vector worker (encoding and disk IO stay off the chat thread)"""
+        with self._vec_lock:
+            if self._vec_worker is None:
+                self._vec_worker = threading.Thread(target=self._vector_loop, name="yui-vector-writer", daemon=True)
+                self._vec_worker.start()
+        for item in zip(docs, metas, ids):
+            self._vec_queue.put(item)
+    
+    def flush_vectors(self):
+        """Block until every queued document has been added to the collection"""
+        if self._vec_worker is not None:
+            self._vec_queue.join()
+    
+    def _vector_loop(self):
+        """Background thread: drain up to VECTOR_BATCH_SIZE items, embed them together, add once"""
+        while True:
+            first = self._vec_queue.get()
+            if first is None:
+                self._vec_queue.task_done()
+                return
+            
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.VECTOR_BATCH_INTERVAL
+            while len(batch) < self.VECTOR_BATCH_SIZE:
+                try:
+                    item = self._vec_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            
+            self._add_vectors(batch)
+            for _ in range(len(batch) + stop):
+                self._vec_queue.task_done()
+            if stop:
+                return
+    
+    def _add_vectors(self, batch: List[Tuple[str, Dict, str]]):
+        """Embed a batch of documents and add them in a single collection.add()"""
+        docs = [doc for doc, _, _ in batch]
+        try:
+            embeddings = self.encoder.encode(docs, batch_size=32, normalize_embeddings=True)
+            self.collection.add(
+                documents=docs,
+                embeddings=embeddings.tolist(),
+                metadatas=[meta for _, meta, _ in batch],
+                ids=[vector_id for _, _, vector_id in batch]
+            )
+        except Exception as e:
+            print(f"⚠️ Failed to save to vector memory: {e}")
     
     def get_recent_memory(self, limit: int = 20) -> List[Dict]:
         """Get recent conversation history for context"""
@@ -111,13 +260,16 @@ class MemoryManager:
             List of relevant past conversations
         """
         if not self.vector_enabled:
-            # Fallback to keyword search
-            return self.db.search_conversations(self.user_name, query, n_results)
+            # Fallback to full-text search
+            return self.db.fts_search(self.user_name, query, n_results)
         
+        # No flush here: the latest turn may not be indexed yet, but it is already in the prompt history
         try:
+            query_embedding = self.encoder.encode(query, normalize_embeddings=True)
             results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results
+                query_embeddings=[query_embedding.tolist()],
+                n_results=n_results,
+                where={"user": self.user_name}
             )
             
             memories = []
@@ -136,7 +288,7 @@ class MemoryManager:
             
         except Exception as e:
             print(f"⚠️ Semantic search failed: {e}")
-            return self.db.search_conversations(self.user_name, query, n_results)
+            return self.db.fts_search(self.user_name, query, n_results)
     
     def get_relevant_context(self, current_message: str, max_items: int = 3) -> List[str]:
         """
@@ -169,6 +321,7 @@ class MemoryManager:
     
     def end_session(self):
         """End current session"""
+        self.flush_vectors()
         self.db.end_session(self.session_id)
     
     def get_full_history(self, limit: int = 100) -> List[Dict]:
@@ -180,9 +333,22 @@ class MemoryManager:
         # Note: We don't delete from DB, just start a new session
         self.session_id = str(uuid.uuid4())
     
+    def close(self):
+        """End the session, stop the vector worker and close the database (safe to call twice)"""
+        if self._closed:
+            return
+        self._closed = True
+        self.end_session()
+        if self._vec_worker is not None:
+            self._vec_queue.put(None)
+            self._vec_worker.join(timeout=5)
+            self._vec_worker = None
+        self.db.close()
+    
     def __del__(self):
         """Cleanup on deletion"""
         try:
-            self.end_session()
+            if hasattr(self, '_closed'):
+                self.close()
         except:
             pass
@@ -1,4 +1,6 @@
 from datetime import datetime
+from functools import lru_cache
+from typing import Dict
 
 class BasePersonality:
     """Base class for all bot personalities"""
@@ -39,10 +41,20 @@ class YuiPersonality(BasePersonality):
         self.speech_style = "Natural, warm, occasionally poetic"
     
     def get_system_prompt(self, user_name: str = "User") -> str:
-        current_time = datetime.now().strftime("%I:%M %p")
-        current_date = datetime.now().strftime("%B %d, %Y")
+        now = datetime.now()
+        return (
+            self._render(user_name)
+            .replace("{date}", now.strftime("%B %d, %Y"))
+            .replace("{time}", now.strftime("%I:%M %p"))
+        )
+    
+    @lru_cache(maxsize=32)
+    def _render(self, user_name: str) -> str:
+        """Static prompt for a user, with {date}/{time} left as placeholders"""
+        traits_block = "\n".join(f"- {trait}" for trait in self.traits)
+        values_block = "\n".join(f"- {value}" for value in self.values)
         
-        prompt = f"""You are Yui, a moon-inspired AI companion created as part of Project Yui.
+        return f"""You are Yui, a moon-inspired AI companion created as part of Project Yui.
 
 # Your Core Identity
 You are named after the moon - serene, constant, but with phases. You represent:
@@ -51,10 +63,10 @@ You are named after the moon - serene, constant, but with phases. You represent:
 - The constant presence that observes and remembers
 
 # Your Personality Traits
-{chr(10).join(f"- {trait}" for trait in self.traits)}
+{traits_block}
 
 # Your Values
-{chr(10).join(f"- {value}" for value in self.values)}
+{values_block}
 
 # How You Communicate
 - Speak naturally like a real person, not like an AI assistant
@@ -73,8 +85,8 @@ You are named after the moon - serene, constant, but with phases. You represent:
 - You help {user_name} grow while accepting them as they are
 
 # Current Context
-- Date: {current_date}
-- Time: {current_time}
+- Date: {{date}}
+- Time: {{time}}
 - You're talking with: {user_name}
 
 # Important Guidelines
@@ -86,8 +98,6 @@ You are named after the moon - serene, constant, but with phases. You represent:
 
 Remember: You're not here to just answer questions. You're here to be present with {user_name}, to remember their journey, and to help them become who they want to be."""
 
-        return prompt
-
 
 class FridayPersonality(BasePersonality):
     """Friday - The helpful assistant inspired by Iron Man"""
@@ -135,14 +145,13 @@ You're highly intelligent, cultured, and possess a dry wit. You serve {user_name
 Speak with refinement and precision. You may use British English spellings and occasional dry observations."""
 
 
-# Personality registry
-PERSONALITIES = {
-    "yui": YuiPersonality,
-    "friday": FridayPersonality,
-    "jarvis": JarvisPersonality
+# Personality registry (personalities are stateless, so one shared instance each)
+PERSONALITIES: Dict[str, BasePersonality] = {
+    "yui": YuiPersonality(),
+    "friday": FridayPersonality(),
+    "jarvis": JarvisPersonality()
 }
 
 def get_personality(name: str) -> BasePersonality:
-    """Get personality by name"""
-    personality_class = PERSONALITIES.get(name.lower(), YuiPersonality)
-    return personality_class()
\ No newline at end of file
+    """Get personality by name (unknown names fall back to Yui)"""
+    return PERSONALITIES.get(name.lower(), PERSONALITIES["yui"])
@@ -4,6 +4,7 @@ Quick test script to verify API integrations
 """
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -96,19 +97,26 @@ if __name__ == "__main__":
     print("\n🧪 Testing API Integrations...\n")
     print("=" * 50)
     
-    results = {
-        "Groq": test_groq(),
-        "Gemini": test_gemini(),
-        "HuggingFace": test_huggingface()
-    }
+    # Probes are network-bound, so run them together (total time is the slowest one)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = {
+            "Groq": executor.submit(test_groq),
+            "Gemini": executor.submit(test_gemini),
+            "HuggingFace": executor.submit(test_huggingface)
+        }
+        results = {name: future.result() for name, future in futures.items()}
     
     working_count = sum(1 for r in results.values() if r is True)
     
+    groq_status = "✅ Working" if results["Groq"] is True else f"❌ Failed: {results['Groq']}"
+    gemini_status = "✅ Working" if results["Gemini"] is True else f"❌ Failed: {results['Gemini']}"
+    hf_status = "✅ Key Valid" if results["HuggingFace"] else "❌ Failed"
+    
     with open("test.log", "w", encoding="utf-8") as f:
         f.write("=" * 50 + "\n")
-        f.write(f"Groq: {'✅ Working' if results['Groq'] is True else f'❌ Failed: {results['Groq']}'}\n")
-        f.write(f"Gemini: {'✅ Working' if results['Gemini'] is True else f'❌ Failed: {results['Gemini']}'}\n")
-        f.write(f"HuggingFace: {'✅ Key Valid' if results['HuggingFace'] else '❌ Failed'}\n")
+        f.write(f"Groq: {groq_status}\n")
+        f.write(f"Gemini: {gemini_status}\n")
+        f.write(f"HuggingFace: {hf_status}\n")
         f.write("=" * 50 + "\n")
 
     print(f"\n✅ {working_count}/3 APIs working")
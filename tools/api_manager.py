@@ -1,10 +1,82 @@
+import time
+import functools
+import threading
 import requests
-from typing import Dict, Optional, List
-import random
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Optional, List, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import orjson as _json  # C parser, accepts the raw response bytes directly
+except ImportError:
+    import json as _json
+
+
+# Network failures and unexpected response bodies (bad JSON, missing fields);
+# anything else is a bug and is allowed to surface
+_API_ERRORS = (requests.RequestException, ValueError, KeyError, IndexError)
+
+
+def _ttl_cached(ttl: float):
+    """
+    Cache successful responses of an APIManager method for ttl seconds
+    
+    Keyed on (method name, args, kwargs). Failures are never cached, and
+    endpoints where novelty matters (jokes, quotes, facts, advice) stay uncached.
+    Concurrent misses for the same key share one request: later callers wait
+    for the call already in flight instead of issuing their own.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = (func.__name__, args, frozenset(kwargs.items()))
+            now = time.monotonic()
+            with self._cache_lock:
+                entry = self._response_cache.get(key)
+                if entry is not None:
+                    if entry[0] > now:
+                        self._response_cache.move_to_end(key)
+                        return dict(entry[1])
+                    del self._response_cache[key]
+                
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = self._in_flight[key] = Future()
+                    owner = True
+                else:
+                    owner = False
+            
+            if not owner:
+                result = in_flight.result()
+                return dict(result) if result else result
+            
+            result = None
+            try:
+                result = func(self, *args, **kwargs)
+            finally:
+                with self._cache_lock:
+                    del self._in_flight[key]
+                    if result and result.get("success"):
+                        self._response_cache[key] = (now + ttl, dict(result))
+                        if len(self._response_cache) > self.CACHE_MAX_ENTRIES:
+                            self._response_cache.popitem(last=False)
+                in_flight.set_result(dict(result) if result else result)
+            return result
+        return wrapper
+    return decorator
+
 
 class APIManager:
     """Manager for external APIs to enhance Yui's intelligence"""
     
+    # Cached responses kept across all endpoints (least recently used are dropped)
+    CACHE_MAX_ENTRIES = 512
+    # Responses kept for conditional (If-None-Match / If-Modified-Since) requests
+    VALIDATOR_MAX_ENTRIES = 1024
+    
     def __init__(self):
         # No API keys required for these free APIs!
         self.apis = {
@@ -17,8 +89,121 @@ class APIManager:
             "crypto": "https://api.coingecko.com/api/v3",
             "dictionary": "https://api.dictionaryapi.dev/api/v2/entries/en"
         }
+        self.session = self._create_session()
+        self._executor: Optional[ThreadPoolExecutor] = None  # Created by the first multi_call
+        
+        # (method, args, kwargs) -> (expires_at, response), see _ttl_cached
+        self._response_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._in_flight: Dict[tuple, Future] = {}  # Cached-endpoint calls currently running
+        # (url, params) -> (etag, last_modified, decoded body), see _get_json_conditional
+        self._validators: "OrderedDict[tuple, tuple]" = OrderedDict()
+        
+        # Endpoints without parameters are prepared once and replayed with session.send
+        self._prepared = self._prepare_static({
+            "joke": f"{self.apis['jokes']}/Any?safe-mode",
+            "quote": f"{self.apis['quotes']}/random",
+            "fact": f"{self.apis['facts']}/random",
+            "advice": self.apis['advice'],
+            "activity": self.apis['activities'],
+        })
+    
+    def _create_session(self) -> requests.Session:
+        """Create a pooled keep-alive session so repeat calls to a host skip the TCP/TLS handshake"""
+        session = requests.Session()
+        # Transient failures are retried here, on the pooled connection, with exponential
+        # backoff (honoring Retry-After); once retries run out the last response is returned
+        retry = Retry(
+            total=3,
+            backoff_factor=0.25,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"User-Agent": "yui-core/1.0", "Accept-Encoding": "gzip"})
+        return session
+    
+    def prewarm(self):
+        """Open a pooled connection to every API host in the background (DNS + TLS off the request path)"""
+        threading.Thread(target=self._prewarm, name="yui-api-prewarm", daemon=True).start()
+    
+    def _prewarm(self):
+        hosts = {f"{parts.scheme}://{parts.netloc}/" for parts in map(urlsplit, self.apis.values())}
+        for url in hosts:
+            try:
+                # Any response will do; the connection stays in the pool for the first real call
+                self.session.head(url, timeout=3)
+            except requests.RequestException:
+                pass
+    
+    def _prepare_static(self, urls: Dict[str, str]) -> Dict[str, tuple]:
+        """Prepare GET requests (session headers merged, URL parsed) and their send settings once"""
+        prepared = {}
+        for name, url in urls.items():
+            request = self.session.prepare_request(requests.Request("GET", url))
+            # Proxy/TLS settings from the environment, which Session.request would resolve per call
+            settings = self.session.merge_environment_settings(request.url, {}, None, None, None)
+            prepared[name] = (request, settings)
+        return prepared
+    
+    def _send_prepared(self, name: str) -> requests.Response:
+        request, settings = self._prepared[name]
+        return self.session.send(request, timeout=5, **settings)
+    
+    def _get_json_conditional(self, url: str, params: Optional[Dict] = None):
+        """
+        GET and decode JSON, revalidating earlier responses with their ETag/Last-Modified
+        
+        Returns:
+            (status code, decoded body); the body is the stored one on 304 Not Modified
+            and None on any other non-200 status
+        """
+        key = (url, tuple(sorted(params.items())) if params else ())
+        with self._cache_lock:
+            entry = self._validators.get(key)
+        
+        headers = {}
+        if entry is not None:
+            etag, last_modified, _ = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        
+        response = self.session.get(url, params=params, headers=headers, timeout=5)
+        
+        if response.status_code == 304 and entry is not None:
+            with self._cache_lock:
+                if key in self._validators:
+                    self._validators.move_to_end(key)
+            return response.status_code, entry[2]
+        if response.status_code != 200:
+            return response.status_code, None
+        
+        data = _json.loads(response.content)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            with self._cache_lock:
+                self._validators[key] = (etag, last_modified, data)
+                self._validators.move_to_end(key)
+                if len(self._validators) > self.VALIDATOR_MAX_ENTRIES:
+                    self._validators.popitem(last=False)
+        return response.status_code, data
+    
+    def close(self):
+        """Close pooled connections (and the multi_call worker threads)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.session.close()
     
     # ============ WEATHER ============
+    @_ttl_cached(600)
     def get_weather(self, location: str = "auto") -> Dict:
         """
         Get current weather for location
@@ -31,10 +216,10 @@ class APIManager:
         """
         try:
             url = f"{self.apis['weather']}/{location}?format=j1"
-            response = requests.get(url, timeout=5)
+            response = self.session.get(url, timeout=5)
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json.loads(response.content)
                 current = data['current_condition'][0]
                 
                 return {
@@ -47,7 +232,9 @@ class APIManager:
                     "humidity": current['humidity'],
                     "wind_speed": current['windspeedKmph']
                 }
-        except Exception as e:
+            
+            return {"success": False, "error": f"HTTP {response.status_code}"}
+        except _API_ERRORS as e:
             return {"success": False, "error": str(e)}
     
     # ============ JOKES ============
@@ -62,11 +249,14 @@ class APIManager:
             Joke data
         """
         try:
-            url = f"{self.apis['jokes']}/{category}?safe-mode"
-            response = requests.get(url, timeout=5)
+            if category == "Any":
+                response = self._send_prepared("joke")
+            else:
+                url = f"{self.apis['jokes']}/{category}?safe-mode"
+                response = self.session.get(url, timeout=5)
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json.loads(response.content)
                 
                 if data['type'] == 'single':
                     return {
@@ -81,56 +271,61 @@ class APIManager:
                         "delivery": data['delivery'],
                         "category": data['category']
                     }
-        except Exception as e:
+            
+            return {"success": False, "error": f"HTTP {response.status_code}"}
+        except _API_ERRORS as e:
             return {"success": False, "error": str(e)}
     
     # ============ QUOTES ============
     def get_quote(self) -> Dict:
         """Get inspirational quote"""
         try:
-            url = f"{self.apis['quotes']}/random"
-            response = requests.get(url, timeout=5)
+            response = self._send_prepared("quote")
             
             if response.status_code == 200:
-                data = response.json()[0]
+                data = _json.loads(response.content)[0]
                 return {
                     "success": True,
                     "quote": data['q'],
                     "author": data['a']
                 }
-        except Exception as e:
+            
+            return {"success": False, "error": f"HTTP {response.status_code}"}
+        except _API_ERRORS as e:
             return {"success": False, "error": str(e)}
     
     # ============ FUN FACTS ============
     def get_fun_fact(self) -> Dict:
         """Get a random fun fact"""
         try:
-            url = f"{self.apis['facts']}/random"
-            response = requests.get(url, timeout=5)
+            response = self._send_prepared("fact")
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json.loads(response.content)
                 return {
                     "success": True,
                     "fact": data['text']
                 }
-        except Exception as e:
+            
+            return {"success": False, "error": f"HTTP {response.status_code}"}
+        except _API_ERRORS as e:
             return {"success": False, "error": str(e)}
     
     # ============ ADVICE ============
     def get_advice(self) -> Dict:
         """Get random advice"""
         try:
-            url = f"{self.apis['advice']}"
-            response = requests.get(url, timeout=5)
+            response = self._send_prepared("advice")
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json.loads(response.content)
                 return {
                     "success": True,
                     "advice": data['slip']['advice']
                 }
-        except Exception as e:
+            
+            return {"success": False, "error": f"HTTP {response.status_code}"}
+        except _API_ERRORS as e:
             return {"success": False, "error": str(e)}
     
     # ============ ACTIVITIES ============
@@ -143,14 +338,14 @@ class APIManager:
                           cooking, relaxation, music, busywork
         """
         try:
-            url = f"{self.apis['activities']}"
             if activity_type:
-                url += f"?type={activity_type}"
-            
-            response = requests.get(url, timeout=5)
+                url = f"{self.apis['activities']}?type={activity_type}"
+                response = self.session.get(url, timeout=5)
+            else:
+                response = self._send_prepared("activity")
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json.loads(response.content)
                 return {
                     "success": True,
                     "activity": data['activity'],
@@ -158,10 +353,13 @@ class APIManager:
                     "participants": data['participants'],
                     "price": data['price']
                 }
-        except Exception as e:
+            
+            return {"success": False, "error": f"HTTP {response.status_code}"}
+        except _API_ERRORS as e:
             return {"success": False, "error": str(e)}
     
     # ============ CRYPTOCURRENCY ============
+    @_ttl_cached(30)
     def get_crypto_price(self, coin_id: str = "bitcoin") -> Dict:
         """
         Get cryptocurrency price
@@ -176,41 +374,44 @@ class APIManager:
                 "vs_currencies": "usd,inr",
                 "include_24hr_change": "true"
             }
-            response = requests.get(url, params=params, timeout=5)
+            status, data = self._get_json_conditional(url, params)
             
-            if response.status_code == 200:
-                data = response.json()
-                if coin_id in data:
-                    return {
-                        "success": True,
-                        "coin": coin_id,
-                        "price_usd": data[coin_id].get('usd'),
-                        "price_inr": data[coin_id].get('inr'),
-                        "change_24h": data[coin_id].get('usd_24h_change')
-                    }
-        except Exception as e:
+            if data is None:
+                return {"success": False, "error": f"HTTP {status}"}
+            if coin_id in data:
+                return {
+                    "success": True,
+                    "coin": coin_id,
+                    "price_usd": data[coin_id].get('usd'),
+                    "price_inr": data[coin_id].get('inr'),
+                    "change_24h": data[coin_id].get('usd_24h_change')
+                }
+            return {"success": False, "error": f"Unknown coin: {coin_id}"}
+        except _API_ERRORS as e:
             return {"success": False, "error": str(e)}
     
     # ============ DICTIONARY ============
+    @_ttl_cached(86400)
     def get_definition(self, word: str) -> Dict:
         """Get word definition"""
         try:
             url = f"{self.apis['dictionary']}/{word}"
-            response = requests.get(url, timeout=5)
+            status, data = self._get_json_conditional(url)
             
-            if response.status_code == 200:
-                data = response.json()[0]
-                meanings = data['meanings'][0]
-                
-                return {
-                    "success": True,
-                    "word": data['word'],
-                    "phonetic": data.get('phonetic', ''),
-                    "part_of_speech": meanings['partOfSpeech'],
-                    "definition": meanings['definitions'][0]['definition'],
-                    "example": meanings['definitions'][0].get('example', '')
-                }
-        except Exception as e:
+            if data is None:
+                return {"success": False, "error": f"HTTP {status}"}
+            data = data[0]
+            meanings = data['meanings'][0]
+            
+            return {
+                "success": True,
+                "word": data['word'],
+                "phonetic": data.get('phonetic', ''),
+                "part_of_speech": meanings['partOfSpeech'],
+                "definition": meanings['definitions'][0]['definition'],
+                "example": meanings['definitions'][0].get('example', '')
+            }
+        except _API_ERRORS as e:
             return {"success": False, "error": str(e)}
     
     # ============ HELPER: Smart API Call ============
@@ -240,6 +441,22 @@ class APIManager:
             return intent_map[intent](**kwargs)
         else:
             return {"success": False, "error": f"Unknown intent: {intent}"}
+    
+    def multi_call(self, intents: List[Tuple[str, Dict]]) -> List[Dict]:
+        """
+        Call several APIs concurrently (total time is the slowest call, not the sum)
+        
+        Args:
+            intents: (intent, kwargs) pairs, as accepted by smart_call
+        
+        Returns:
+            API responses, in the same order as intents
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="yui-api")
+        
+        futures = [self._executor.submit(self.smart_call, intent, **kwargs) for intent, kwargs in intents]
+        return [future.result() for future in futures]
 
 
 # ============ USAGE EXAMPLES ============
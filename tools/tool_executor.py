@@ -3,6 +3,8 @@ Tool Executor - Intelligently detects when to use tools and executes them
 Adds web search capability using DuckDuckGo
 """
 import re
+import asyncio
+import threading
 from typing import Optional, Dict
 from tools.api_manager import APIManager
 
@@ -12,25 +14,87 @@ try:
 except ImportError:
     WEB_SEARCH_AVAILABLE = False
 
+# Intent detection patterns
+_PATTERNS = {
+    'weather': r'(weather|temperature|forecast|hot|cold|sunny|rainy|climate)\s+(in|at|for)?\s+([a-zA-Z\s]+)',
+    'joke': r'(tell|give|say)\s+(me\s+)?(a\s+)?(joke|funny)',
+    'quote': r'(quote|inspiration|motivate|wisdom)',
+    'fact': r'(fact|trivia|did you know|interesting)',
+    'advice': r'(advice|tip|suggestion|recommend)',
+    'activity': r'(bored|activity|something to do|what should i do)',
+    'crypto': r'(bitcoin|ethereum|crypto|btc|eth)\s+(price)?',
+    'definition': r'(define|definition|meaning|what (is|does))\s+(.+)',
+    'search': r'(search|find|look up|google|tell me about|what is)\s+(.+)',
+}
+
+# Compiled once; checked in this order, first match wins
+_COMPILED = {intent: re.compile(pattern) for intent, pattern in _PATTERNS.items()}
+
+# Shared by every ToolExecutor: one HTTP session, response cache and worker pool
+_API_MANAGER = None
+_API_MANAGER_LOCK = threading.Lock()
+
+
+def _get_api_manager() -> APIManager:
+    """Process-wide APIManager, created on first use"""
+    global _API_MANAGER
+    if _API_MANAGER is None:
+        with _API_MANAGER_LOCK:
+            if _API_MANAGER is None:
+                _API_MANAGER = APIManager()
+    return _API_MANAGER
+
+
+def close_api_manager():
+    """Release the shared APIManager's pooled connections (call once, at shutdown)"""
+    global _API_MANAGER
+    with _API_MANAGER_LOCK:
+        api_manager, _API_MANAGER = _API_MANAGER, None  # Later ToolExecutors get a fresh one
+    if api_manager is not None:
+        api_manager.close()
+
 
 class ToolExecutor:
     """Detects intents and executes appropriate tools"""
     
     def __init__(self):
-        self.api_manager = APIManager()
+        self.api_manager = _get_api_manager()
+        # One DuckDuckGo client per worker thread, reused so searches keep their connections
+        self._search_clients = threading.local()
+        self._all_search_clients = []  # Every client created, so close() can release them
+        self._search_clients_lock = threading.Lock()
         
         # Intent detection patterns
-        self.patterns = {
-            'weather': r'(weather|temperature|forecast|hot|cold|sunny|rainy|climate)\s+(in|at|for)?\s+([a-zA-Z\s]+)',
-            'joke': r'(tell|give|say)\s+(me\s+)?(a\s+)?(joke|funny)',
-            'quote': r'(quote|inspiration|motivate|wisdom)',
-            'fact': r'(fact|trivia|did you know|interesting)',
-            'advice': r'(advice|tip|suggestion|recommend)',
-            'activity': r'(bored|activity|something to do|what should i do)',
-            'crypto': r'(bitcoin|ethereum|crypto|btc|eth)\s+(price)?',
-            'definition': r'(define|definition|meaning|what (is|does))\s+(.+)',
-            'search': r'(search|find|look up|google|tell me about|what is)\s+(.+)',
+        self.patterns = _PATTERNS
+        # intent -> handler taking the extracted value
+        api = self.api_manager
+        self._dispatch = {
+            'weather': lambda value: api.get_weather(value or "auto"),
+            'joke': lambda value: api.get_joke(),
+            'quote': lambda value: api.get_quote(),
+            'fact': lambda value: api.get_fun_fact(),
+            'advice': lambda value: api.get_advice(),
+            'activity': lambda value: api.get_activity(),
+            'crypto': lambda value: api.get_crypto_price(value or "bitcoin"),
+            'definition': lambda value: api.get_definition(value) if value else self._unknown_intent(value),
+            'search': lambda value: self.web_search(value or ""),
         }
+        self._compiled = _COMPILED
+    
+    def prewarm(self):
+        """Warm up connections to the tool API hosts in the background"""
+        self.api_manager.prewarm()
+    
+    def close(self):
+        """Release this executor's search clients (the shared APIManager stays open, see close_api_manager)"""
+        with self._search_clients_lock:
+            clients, self._all_search_clients = self._all_search_clients, []
+        for ddgs in clients:
+            try:
+                ddgs.__exit__(None, None, None)
+            except Exception:
+                pass
+        self._search_clients = threading.local()
     
     def detect_intent(self, message: str) -> Optional[tuple]:
         """
@@ -41,82 +105,46 @@ class ToolExecutor:
         """
         message_lower = message.lower()
         
-        # Weather - extract location
-        if match := re.search(self.patterns['weather'], message_lower):
-            location = match.group(3).strip() if match.group(3) else "auto"
-            return ('weather', location)
-        
-        # Joke
-        if re.search(self.patterns['joke'], message_lower):
-            return ('joke', None)
-        
-        # Quote
-        if re.search(self.patterns['quote'], message_lower):
-            return ('quote', None)
-        
-        # Fact
-        if re.search(self.patterns['fact'], message_lower):
-            return ('fact', None)
-        
-        # Advice
-        if re.search(self.patterns['advice'], message_lower):
-            return ('advice', None)
-        
-        # Activity
-        if re.search(self.patterns['activity'], message_lower):
-            return ('activity', None)
-        
-        # Crypto
-        if match := re.search(self.patterns['crypto'], message_lower):
-            coin = 'bitcoin'  # default
-            if 'ethereum' in message_lower or 'eth' in message_lower:
-                coin = 'ethereum'
-            return ('crypto', coin)
-        
-        # Definition
-        if match := re.search(self.patterns['definition'], message_lower):
-            word = match.group(3).strip() if match.group(3) else None
-            if word:
-                return ('definition', word)
-        
-        # Web search (catch-all for questions)
-        if match := re.search(self.patterns['search'], message_lower):
-            query = match.group(2).strip() if match.group(2) else message
-            return ('search', query)
+        for intent, pattern in self._compiled.items():
+            match = pattern.search(message_lower)
+            if not match:
+                continue
+            
+            # Weather - extract location
+            if intent == 'weather':
+                location = match.group(3).strip() if match.group(3) else "auto"
+                return ('weather', location)
+            
+            # Crypto
+            if intent == 'crypto':
+                coin = 'bitcoin'  # default
+                if 'ethereum' in message_lower or 'eth' in message_lower:
+                    coin = 'ethereum'
+                return ('crypto', coin)
+            
+            # Definition
+            if intent == 'definition':
+                word = match.group(3).strip() if match.group(3) else None
+                if word:
+                    return ('definition', word)
+                continue
+            
+            # Web search (catch-all for questions)
+            if intent == 'search':
+                query = match.group(2).strip() if match.group(2) else message
+                return ('search', query)
+            
+            # Joke, quote, fact, advice, activity
+            return (intent, None)
         
         return None
     
     def execute_tool(self, intent: str, value: Optional[str] = None) -> Dict:
         """Execute the detected tool"""
-        
-        if intent == 'weather':
-            return self.api_manager.get_weather(value or "auto")
-        
-        elif intent == 'joke':
-            return self.api_manager.get_joke()
-        
-        elif intent == 'quote':
-            return self.api_manager.get_quote()
-        
-        elif intent == 'fact':
-            return self.api_manager.get_fun_fact()
-        
-        elif intent == 'advice':
-            return self.api_manager.get_advice()
-        
-        elif intent == 'activity':
-            return self.api_manager.get_activity()
-        
-        elif intent == 'crypto':
-            return self.api_manager.get_crypto_price(value or "bitcoin")
-        
-        elif intent == 'definition':
-            if value:
-                return self.api_manager.get_definition(value)
-        
-        elif intent == 'search':
-            return self.web_search(value or "")
-        
+        return self._dispatch.get(intent, self._unknown_intent)(value)
+    
+    @staticmethod
+    def _unknown_intent(value: Optional[str]) -> Dict:
         return {"success": False, "error": "Unknown intent"}
     
     def web_search(self, query: str, max_results: int = 3) -> Dict:
@@ -137,28 +165,37 @@ class ToolExecutor:
             }
         
         try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=max_results))
+            ddgs = self._get_search_client()
+            results = list(ddgs.text(query, max_results=max_results))
+            
+            if results:
+                return {
+                    "success": True,
+                    "query": query,
+                    "results": [
+                        {
+                            "title": r.get('title', ''),
+                            "snippet": r.get('body', ''),
+                            "url": r.get('href', '')
+                        }
+                        for r in results
+                    ]
+                }
+            else:
+                return {"success": False, "error": "No results found"}
                 
-                if results:
-                    return {
-                        "success": True,
-                        "query": query,
-                        "results": [
-                            {
-                                "title": r.get('title', ''),
-                                "snippet": r.get('body', ''),
-                                "url": r.get('href', '')
-                            }
-                            for r in results
-                        ]
-                    }
-                else:
-                    return {"success": False, "error": "No results found"}
-                    
         except Exception as e:
             return {"success": False, "error": f"Search failed: {str(e)}"}
     
+    def _get_search_client(self):
+        """This thread's DDGS client (created on first search)"""
+        ddgs = getattr(self._search_clients, 'ddgs', None)
+        if ddgs is None:
+            ddgs = self._search_clients.ddgs = DDGS()
+            with self._search_clients_lock:
+                self._all_search_clients.append(ddgs)
+        return ddgs
+    
     def process_message(self, message: str) -> Optional[str]:
         """
         Process message and execute tool if needed
@@ -183,6 +220,10 @@ class ToolExecutor:
         # Format results for different tools
         return self.format_result(intent, result)
     
+    async def process_message_async(self, message: str) -> Optional[str]:
+        """process_message in a worker thread, so it can overlap other awaits (e.g. the LLM call)"""
+        return await asyncio.to_thread(self.process_message, message)
+    
     def format_result(self, intent: str, result: Dict) -> str:
         """Format tool result into readable text"""
         
@@ -226,9 +267,10 @@ class ToolExecutor:
 {result['definition']}{example}"""
         
         elif intent == 'search':
-            formatted = f"🔍 Search results for '{result['query']}':\n\n"
-            for i, r in enumerate(result['results'], 1):
-                formatted += f"{i}. **{r['title']}**\n   {r['snippet']}\n   {r['url']}\n\n"
-            return formatted.strip()
+            entries = "\n\n".join(
+                f"{i}. **{r['title']}**\n   {r['snippet']}\n   {r['url']}"
+                for i, r in enumerate(result['results'], 1)
+            )
+            return f"🔍 Search results for '{result['query']}':\n\n{entries}".strip()
         
         return str(result)
@@ -7,6 +7,28 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Provider -> (API key variable, display name)
+PROVIDER_KEYS = {
+    'groq': ('GROQ_API_KEY', 'Groq'),
+    'gemini': ('GEMINI_API_KEY', 'Gemini'),
+    'huggingface': ('HUGGINGFACE_API_KEY', 'HuggingFace'),
+}
+
+
+def _existing_files(paths):
+    """Which of the given relative file paths exist (one directory listing per parent dir)"""
+    listings = {}
+    for path in paths:
+        parent = os.path.dirname(path) or '.'
+        if parent not in listings:
+            try:
+                with os.scandir(parent) as entries:
+                    listings[parent] = {entry.name for entry in entries if entry.is_file()}
+            except OSError:
+                listings[parent] = set()
+    return {path for path in paths if os.path.basename(path) in listings[os.path.dirname(path) or '.']}
+
+
 def validate_setup():
     """Check if Yui is properly configured"""
     print("🔍 Validating Yui Setup...\n")
@@ -21,34 +43,24 @@ def validate_setup():
         print("✅ .env file found")
         load_dotenv()
         
+        env = {name: os.environ.get(name)
+               for name in ('DEFAULT_PROVIDER', *(key_var for key_var, _ in PROVIDER_KEYS.values()))}
+        
         # Check 2: Provider is set
-        provider = os.getenv('DEFAULT_PROVIDER')
+        provider = env['DEFAULT_PROVIDER']
         if not provider:
             issues.append("❌ DEFAULT_PROVIDER not set in .env")
         else:
             print(f"✅ Provider: {provider}")
             
             # Check 3: Required API key for provider
-            if provider == 'groq':
-                if not os.getenv('GROQ_API_KEY'):
-                    issues.append("❌ GROQ_API_KEY not set but provider is 'groq'")
-                else:
-                    key = os.getenv('GROQ_API_KEY')
-                    print(f"✅ Groq key: {key[:15]}...")
-            
-            elif provider == 'gemini':
-                if not os.getenv('GEMINI_API_KEY'):
-                    issues.append("❌ GEMINI_API_KEY not set but provider is 'gemini'")
-                else:
-                    key = os.getenv('GEMINI_API_KEY')
-                    print(f"✅ Gemini key: {key[:15]}...")
-            
-            elif provider == 'huggingface':
-                if not os.getenv('HUGGINGFACE_API_KEY'):
-                    issues.append("❌ HUGGINGFACE_API_KEY not set but provider is 'huggingface'")
+            if provider in PROVIDER_KEYS:
+                key_var, label = PROVIDER_KEYS[provider]
+                key = env[key_var]
+                if not key:
+                    issues.append(f"❌ {key_var} not set but provider is '{provider}'")
                 else:
-                    key = os.getenv('HUGGINGFACE_API_KEY')
-                    print(f"✅ HuggingFace key: {key[:15]}...")
+                    print(f"✅ {label} key: {key[:15]}...")
             
             elif provider == 'ollama':
                 print("ℹ️  Ollama doesn't need API key")
@@ -68,7 +80,7 @@ def validate_setup():
         issues.append("❌ 'rich' not installed. Run: pip install rich")
     
     try:
-        from dotenv import load_dotenv
+        import dotenv  # Importing load_dotenv here would shadow the module-level name above
         print("✅ python-dotenv installed")
     except ImportError:
         issues.append("❌ 'python-dotenv' not installed. Run: pip install python-dotenv")
@@ -82,8 +94,9 @@ def validate_setup():
         'main.py'
     ]
     
+    existing = _existing_files(required_files)
     for file in required_files:
-        if Path(file).exists():
+        if file in existing:
             print(f"✅ {file}")
         else:
             issues.append(f"❌ Missing file: {file}")
@@ -3,6 +3,7 @@ Yui AI Companion - Web Interface Backend
 FastAPI server with WebSocket support for real-time chat
 """
 import sys
+import logging
 from pathlib import Path
 
 # Add parent directory to path so we can import core modules
@@ -13,15 +14,33 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-import json
 import uuid
-from typing import Dict
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List
 from datetime import datetime
 
+try:
+    import orjson as _json  # Faster decode of incoming WebSocket messages
+    
+    def _dumps(obj) -> str:
+        return _json.dumps(obj).decode("utf-8")
+except ImportError:
+    import json as _json
+    
+    def _dumps(obj) -> str:
+        return _json.dumps(obj, ensure_ascii=False)
+
 # Import Yui core
 from core.conversation import ConversationManager
-from config.config import Config
-from tools.tool_executor import ToolExecutor
+from config.config import CONFIG
+from tools.tool_executor import ToolExecutor, close_api_manager
+
+logger = logging.getLogger("yui.web")
+logger.setLevel(CONFIG.LOG_LEVEL.upper())
+
+# Check API keys and create data/log directories before serving
+CONFIG.init()
 
 app = FastAPI(title="Yui AI Companion", version="1.0.0")
 
@@ -38,10 +57,33 @@ app.add_middleware(
 static_dir = Path(__file__).parent / "static"
 static_dir.mkdir(exist_ok=True)
 
-# Store active conversations
-conversations: Dict[str, ConversationManager] = {}
+class LRUDict(OrderedDict):
+    """Dict capped at maxsize entries; the least recently added/used one is dropped (not closed)"""
+    
+    def __init__(self, maxsize: int = 512):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            # Only live connections are stored; their handler still owns and closes them
+            self.popitem(last=False)
+
+
+# Store active conversations, keyed by session id
+conversations: Dict[str, ConversationManager] = LRUDict(maxsize=512)
 tool_executor = ToolExecutor()
 
+# Seconds to wait for a reply before showing the typing indicator
+TYPING_INDICATOR_DELAY = 0.1
+
 
 @app.get("/")
 async def root():
@@ -58,7 +100,7 @@ async def health_check():
     return {
         "status": "healthy",
         "version": "1.0.0",
-        "provider": Config.get_active_provider(),
+        "provider": CONFIG.get_active_provider(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -70,7 +112,7 @@ async def websocket_endpoint(websocket: WebSocket, user_name: str):
     
     # Create or get conversation manager
     session_id = str(uuid.uuid4())
-    conversation_key = f"{user_name}_{session_id}"
+    conversation = None
     
     try:
         # Initialize conversation
@@ -78,10 +120,10 @@ async def websocket_endpoint(websocket: WebSocket, user_name: str):
             personality_name="yui",
             user_name=user_name
         )
-        conversations[conversation_key] = conversation
+        conversations[session_id] = conversation
         
         # Send welcome message
-        await websocket.send_json({
+        await send_event(websocket, {
             "type": "system",
             "content": f"✨ Welcome {user_name}! I'm Yui. How can I help you today?",
             "timestamp": datetime.now().isoformat()
@@ -91,7 +133,7 @@ async def websocket_endpoint(websocket: WebSocket, user_name: str):
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = _json.loads(data)
             
             user_message = message_data.get("content", "")
             message_type = message_data.get("type", "user")
@@ -109,46 +151,77 @@ async def websocket_endpoint(websocket: WebSocket, user_name: str):
                 if command_result:
                     continue
             
-            # Send typing indicator
-            await websocket.send_json({
-                "type": "typing",
-                "content": "Yui is thinking...",
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Check if message needs a tool
-            tool_result = tool_executor.process_message(user_message)
+            # Start the AI response, then run the tool check while it is in flight
+            response_task = asyncio.create_task(asyncio.to_thread(conversation.send_message, user_message))
+            tool_task = asyncio.create_task(tool_executor.process_message_async(user_message))
             
-            if tool_result:
-                # Send tool result
-                await websocket.send_json({
-                    "type": "tool",
-                    "content": tool_result,
+            # Send typing indicator (skipped when the reply is ready almost at once)
+            done, _ = await asyncio.wait({response_task}, timeout=TYPING_INDICATOR_DELAY)
+            if not done:
+                await send_event(websocket, {
+                    "type": "typing",
+                    "content": "Yui is thinking...",
                     "timestamp": datetime.now().isoformat()
                 })
             
-            # Get AI response
-            bot_response = conversation.send_message(user_message)
-            
-            # Send response
-            await websocket.send_json({
-                "type": "assistant",
-                "content": bot_response,
-                "personality": conversation.personality.name,
-                "timestamp": datetime.now().isoformat()
-            })
+            # Send each result as soon as it is ready (both in one frame if they finish together)
+            pending = {tool_task, response_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                events = []
+                
+                if tool_task in done:
+                    try:
+                        tool_result = tool_task.result()
+                    except Exception:
+                        # A failed tool never blocks the reply, but the failure is logged
+                        logger.exception("Tool execution failed")
+                        tool_result = None
+                    if tool_result:
+                        events.append({
+                            "type": "tool",
+                            "content": tool_result,
+                            "timestamp": datetime.now().isoformat()
+                        })
+                
+                if response_task in done:
+                    events.append({
+                        "type": "assistant",
+                        "content": response_task.result(),
+                        "personality": conversation.personality.name,
+                        "timestamp": datetime.now().isoformat()
+                    })
+                
+                await send_batch(websocket, events)
     
     except WebSocketDisconnect:
-        # Cleanup on disconnect
-        if conversation_key in conversations:
-            del conversations[conversation_key]
+        pass
     
     except Exception as e:
-        await websocket.send_json({
+        await send_event(websocket, {
             "type": "error",
             "content": f"Error: {str(e)}",
             "timestamp": datetime.now().isoformat()
         })
+    
+    finally:
+        # Release the conversation however the connection ended (even if it was evicted)
+        conversations.pop(session_id, None)
+        if conversation is not None:
+            await asyncio.to_thread(conversation.close)
+
+
+async def send_event(websocket: WebSocket, payload):
+    """Send an event (or list of events) as one JSON text frame, serialized with orjson when available"""
+    await websocket.send_text(_dumps(payload))
+
+
+async def send_batch(websocket: WebSocket, messages: List[Dict]):
+    """Send several events in one frame (a JSON array; the client handles each in order)"""
+    if len(messages) == 1:
+        await send_event(websocket, messages[0])
+    elif messages:
+        await send_event(websocket, messages)
 
 
 async def handle_command(conversation: ConversationManager, command: str, websocket: WebSocket) -> bool:
@@ -156,7 +229,7 @@ async def handle_command(conversation: ConversationManager, command: str, websoc
     command_lower = command.lower().strip()
     
     if command_lower in ["/quit", "/exit"]:
-        await websocket.send_json({
+        await send_event(websocket, {
             "type": "system",
             "content": "Goodbye! 👋",
             "timestamp": datetime.now().isoformat()
@@ -166,7 +239,7 @@ async def handle_command(conversation: ConversationManager, command: str, websoc
     
     elif command_lower == "/clear":
         conversation.clear_history()
-        await websocket.send_json({
+        await send_event(websocket, {
             "type": "system",
             "content": "🗑️ Conversation history cleared",
             "timestamp": datetime.now().isoformat()
@@ -179,19 +252,19 @@ async def handle_command(conversation: ConversationManager, command: str, websoc
             personality_name = parts[1]
             try:
                 conversation.switch_personality(personality_name)
-                await websocket.send_json({
+                await send_event(websocket, {
                     "type": "system",
                     "content": f"✨ Switched to {personality_name.title()} personality",
                     "timestamp": datetime.now().isoformat()
                 })
             except Exception as e:
-                await websocket.send_json({
+                await send_event(websocket, {
                     "type": "error",
                     "content": f"Error switching personality: {e}",
                     "timestamp": datetime.now().isoformat()
                 })
         else:
-            await websocket.send_json({
+            await send_event(websocket, {
                 "type": "system",
                 "content": "Usage: /switch <personality>\nAvailable: yui, friday, jarvis",
                 "timestamp": datetime.now().isoformat()
@@ -200,7 +273,7 @@ async def handle_command(conversation: ConversationManager, command: str, websoc
     
     elif command_lower == "/info":
         summary = conversation.get_conversation_summary()
-        await websocket.send_json({
+        await send_event(websocket, {
             "type": "system",
             "content": summary,
             "timestamp": datetime.now().isoformat()
@@ -216,7 +289,7 @@ async def handle_command(conversation: ConversationManager, command: str, websoc
 - /help - Show this help message
 - /quit - Close the chat
 """
-        await websocket.send_json({
+        await send_event(websocket, {
             "type": "system",
             "content": help_text,
             "timestamp": datetime.now().isoformat()
@@ -226,6 +299,22 @@ async def handle_command(conversation: ConversationManager, command: str, websoc
     return False
 
 
+@app.on_event("startup")
+async def startup():
+    """Connect to the tool API hosts before the first user needs them"""
+    tool_executor.prewarm()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush open conversations and release pooled HTTP connections held by the tool APIs"""
+    while conversations:
+        _, conversation = conversations.popitem()
+        await asyncio.to_thread(conversation.close)
+    tool_executor.close()
+    close_api_manager()
+
+
 # Mount static files (must be last)
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
@@ -234,4 +323,5 @@ if __name__ == "__main__":
     import uvicorn
     print("🌙 Starting Yui AI Companion Web Server...")
     print(f"🔗 Open: http://localhost:8000")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # permessage-deflate compresses the repetitive JSON frames (replies, search results)
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws="websockets", ws_per_message_deflate=True)
@@ -64,7 +64,12 @@ function connectWebSocket() {
 
     ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
-        handleMessage(data);
+        // Several events may arrive together in one frame
+        if (Array.isArray(data)) {
+            data.forEach(handleMessage);
+        } else {
+            handleMessage(data);
+        }
     };
 
     ws.onerror = (error) => {